@@ -0,0 +1,183 @@
+"""
+Headless batch generation of PALM static drivers.
+
+Builds GridModels from declarative JSON scene descriptions and writes
+them with create_sd.SaveModel, without Tkinter. Many scenes are
+processed in parallel with a process pool.
+
+Usage:
+    python -m base.batch scenes.json [more.json ...] [-o OUTDIR] [-j JOBS]
+                         [-z LEVEL] [--decomposition NPEX NPEY]
+
+A scene file holds one scene object, a list of scenes, or
+{"scenes": [...]}. A scene looks like:
+
+    {
+      "name": "street_canyon",
+      "nx": 64, "ny": 64, "res": 2.0,
+      "origin": [52.50965, 13.3139, 3455249.0, 5424815.0],
+      "output": "street_canyon_static",
+      "background": {"tool": "vegetation", "vegetation_type": 3},
+      "shapes": [
+        {"shape": "rect", "x": [0, 64], "y": [28, 36],
+         "tool": "pavement", "pavement_type": 1},
+        {"shape": "rect", "x": [8, 24], "y": [40, 56],
+         "tool": "building", "building_id": 1, "building_height": 20.0},
+        {"shape": "circle", "center": [48, 16], "radius": 6,
+         "tool": "water", "water_type": 1},
+        {"shape": "rect", "x": [0, 16], "y": [0, 16],
+         "tool": "height", "zt": 4.0}
+      ]
+    }
+
+Coordinates are grid cells: x is the column, y the row counted from the
+bottom (south) edge; ranges are half-open [start, stop). Shapes are
+applied in order, later shapes overwrite earlier ones. Tools and their
+parameters are those of base.tools.
+
+A scene with "children": [{"window": [x0, x1, y0, y1], "ratio": 3}, ...]
+is a nested run: the drivers of the parent and its child domains are
+written as <output>_static, <output>_static_N02, ... with "output"
+defaulting to the scene name (see base.nesting).
+
+-z compresses the output with zlib; --decomposition chunks every
+variable like the subdomains of a PALM run on NPEX x NPEY PEs.
+
+    Copyright (C) 2025  Pierre Lampe
+    Licensed under the GNU General Public License v3 or later.
+"""
+
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from base.create_sd import SaveModel, decomposition_chunks
+from base.gridmodel import GridModel
+from base.nesting import ExportNested
+from base.surface_config import SURFACE_CONFIG
+import base.tools as tools
+
+# lat, lon, projected x, projected y — same default as the GUI
+DEFAULT_ORIGIN = (52.50965, 13.3139, 3455249.0, 5424815.0)
+
+
+def shape_window(model, shape):
+    """Return ``(rows, cols, mask)`` covered by one shape description."""
+    kind = shape.get("shape", "rect")
+    if kind == "rect":
+        x0, x1 = shape.get("x", (0, model.nx))
+        y0, y1 = shape.get("y", (0, model.ny))
+        return slice(max(0, y0), min(model.ny, y1)), slice(max(0, x0), min(model.nx, x1)), None
+    if kind == "circle":
+        cx, cy = shape["center"]
+        radius = float(shape["radius"])
+        r = int(np.ceil(radius))
+        rows = slice(max(0, cy - r), min(model.ny, cy + r + 1))
+        cols = slice(max(0, cx - r), min(model.nx, cx + r + 1))
+        yy, xx = np.ogrid[rows, cols]
+        return rows, cols, (yy - cy) ** 2 + (xx - cx) ** 2 <= radius ** 2
+    raise ValueError(f"Unknown shape '{kind}', expected 'rect' or 'circle'")
+
+
+def apply_shape(model, shape, surface_config=SURFACE_CONFIG):
+    """Paint one shape onto the model with the tool it names."""
+    params = {
+        key: value for key, value in shape.items()
+        if key not in ("shape", "tool", "x", "y", "center", "radius")
+    }
+    values = tools.tool_values(surface_config, shape["tool"], **params)
+    rows, cols, mask = shape_window(model, shape)
+    if shape["tool"] == "soil":
+        paintable = tools.soil_paintable(model, rows, cols)
+        mask = paintable if mask is None else mask & paintable
+    model.write_region(rows, cols, mask, **values)
+
+
+def build_scene(scene, surface_config=SURFACE_CONFIG):
+    """Create a GridModel from a scene description."""
+    model = GridModel(int(scene["nx"]), int(scene["ny"]), float(scene["res"]), surface_config)
+    background = scene.get("background")
+    if background:
+        apply_shape(model, dict(background, shape="rect"), surface_config)
+    for shape in scene.get("shapes", ()):
+        apply_shape(model, shape, surface_config)
+    return model
+
+
+def render_scene(scene, output_dir=".", compression=None, decomposition=None):
+    """Build one scene and write its static driver(s). Returns the file paths."""
+    name = scene.get("name", "scene")
+    model = build_scene(scene)
+    if scene.get("children"):
+        return ExportNested(
+            model, tuple(scene.get("origin", DEFAULT_ORIGIN)), scene["children"],
+            os.path.join(output_dir, scene.get("output", name)),
+            decomposition=decomposition, compression=compression,
+        )
+    filename = os.path.join(output_dir, scene.get("output", f"{name}_static"))
+    chunks = None
+    if decomposition:
+        chunks = decomposition_chunks(model.nx, model.ny, *decomposition)
+    SaveModel(
+        model, tuple(scene.get("origin", DEFAULT_ORIGIN)), filename,
+        compression=compression, chunks=chunks,
+    )
+    return [filename]
+
+
+def read_scenes(paths):
+    """Collect scene dicts from JSON files."""
+    scenes = []
+    for path in paths:
+        with open(path) as file:
+            content = json.load(file)
+        if isinstance(content, dict):
+            content = content.get("scenes", [content])
+        scenes.extend(content)
+    return scenes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Generate PALM static drivers from JSON scene descriptions."
+    )
+    parser.add_argument("scene_files", nargs="+", help="JSON scene description files")
+    parser.add_argument("-o", "--output-dir", default=".", help="directory for the NetCDF files")
+    parser.add_argument("-j", "--jobs", type=int, default=None,
+                        help="number of worker processes (default: CPU count)")
+    parser.add_argument("-z", "--compress", type=int, default=None, metavar="LEVEL",
+                        help="zlib compression level 1-9 (default: uncompressed)")
+    parser.add_argument("--decomposition", type=int, nargs=2, default=None,
+                        metavar=("NPEX", "NPEY"),
+                        help="chunk the output like a PALM run on NPEX x NPEY PEs")
+    args = parser.parse_args(argv)
+
+    scenes = read_scenes(args.scene_files)
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    failed = 0
+    with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+        futures = {
+            pool.submit(
+                render_scene, scene, args.output_dir, args.compress, args.decomposition
+            ): scene.get("name", "scene")
+            for scene in scenes
+        }
+        for future in as_completed(futures):
+            try:
+                for filename in future.result():
+                    print(f"Written: {filename}")
+            except Exception as e:
+                failed += 1
+                print(f"Error in scene '{futures[future]}': {e}", file=sys.stderr)
+
+    print(f"{len(scenes) - failed} of {len(scenes)} scenes written.")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
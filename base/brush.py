@@ -0,0 +1,95 @@
+"""
+Brush footprints for the PALMPaint painting tools.
+
+A brush is a boolean kernel centred on the cell under the cursor. Kernels
+are computed once per brush size and cached; footprint() clips the kernel
+to the domain and returns the window slices plus the matching part of
+the mask, ready for GridModel.write_region(). line() and
+stroke_footprint() sweep the brush along the path between two mouse
+samples, so fast drags leave no gaps. No Tkinter imports.
+
+    Copyright (C) 2025  Pierre Lampe
+    Licensed under the GNU General Public License v3 or later.
+"""
+
+from functools import lru_cache
+
+import numpy as np
+
+
+@lru_cache(maxsize=32)
+def kernel(size):
+    """Boolean mask of a brush of ``size``, shape (2*h+1, 2*h+1) with h = size // 2.
+
+    Cells at a distance of at most ``size`` from the centre belong to the
+    brush. The returned array is shared and read-only.
+    """
+    half = max(0, int(size)) // 2
+    offsets = np.arange(-half, half + 1)
+    mask = offsets[:, None] ** 2 + offsets[None, :] ** 2 <= int(size) ** 2
+    mask.flags.writeable = False
+    return mask
+
+
+def footprint(row, col, size, ny, nx):
+    """Clip the brush centred on ``(row, col)`` to a (ny, nx) domain.
+
+    Returns ``(rows, cols, mask)``: slices of the covered window and the
+    kernel part inside the domain. The window is empty if the brush lies
+    completely outside.
+    """
+    mask = kernel(size)
+    half = mask.shape[0] // 2
+    row0, col0 = row - half, col - half
+
+    r0, r1 = max(row0, 0), min(row + half + 1, ny)
+    c0, c1 = max(col0, 0), min(col + half + 1, nx)
+    r1, c1 = max(r0, r1), max(c0, c1)
+
+    return (
+        slice(r0, r1),
+        slice(c0, c1),
+        mask[r0 - row0:r1 - row0, c0 - col0:c1 - col0],
+    )
+
+
+def line(row0, col0, row1, col1):
+    """Cells of the Bresenham line from ``(row0, col0)`` to ``(row1, col1)``.
+
+    Both end points are included. Returns ``(rows, cols)`` int arrays.
+    """
+    d_row, d_col = row1 - row0, col1 - col0
+    n = max(abs(d_row), abs(d_col))
+    if n == 0:
+        return np.array([row0]), np.array([col0])
+    # Integer rounding of the minor axis, as in Bresenham's algorithm.
+    steps = np.arange(n + 1)
+    rows = row0 + np.sign(d_row) * ((2 * steps * abs(d_row) + n) // (2 * n))
+    cols = col0 + np.sign(d_col) * ((2 * steps * abs(d_col) + n) // (2 * n))
+    return rows, cols
+
+
+def stroke_footprint(rows, cols, size, ny, nx):
+    """Clip the union of brushes centred on all ``(rows, cols)`` to the domain.
+
+    Sweeps the brush along a rasterised stroke. Returns ``(rows, cols,
+    mask)`` like footprint() for the bounding box of the whole stroke.
+    """
+    rows, cols = np.asarray(rows), np.asarray(cols)
+    if rows.size == 1:
+        return footprint(int(rows[0]), int(cols[0]), size, ny, nx)
+
+    half = kernel(size).shape[0] // 2
+    r0, r1 = max(int(rows.min()) - half, 0), min(int(rows.max()) + half + 1, ny)
+    c0, c1 = max(int(cols.min()) - half, 0), min(int(cols.max()) + half + 1, nx)
+    r1, c1 = max(r0, r1), max(c0, c1)
+
+    mask = np.zeros((r1 - r0, c1 - c0), dtype=bool)
+    if mask.size:
+        for row, col in zip(rows.tolist(), cols.tolist()):
+            stamp_rows, stamp_cols, stamp = footprint(row, col, size, ny, nx)
+            mask[
+                stamp_rows.start - r0:stamp_rows.stop - r0,
+                stamp_cols.start - c0:stamp_cols.stop - c0,
+            ] |= stamp
+    return slice(r0, r1), slice(c0, c1), mask
@@ -4,78 +4,171 @@ This file is meant to be used with the PALMPaint application.
     Copyright (C) 2025  Pierre Lampe
     Licensed under the GNU General Public License v3 or later.
 """
-from importlib import metadata
-import netCDF4 as nc
-from netCDF4 import Dataset
 import numpy as np
 
+from base.gridmodel import GridModel
+from base.load_sd import BAND_CELLS, netcdf_lock, window_slices
 
-def Save(data, res, ori, surface_config, filename="quicksave"):
-        #print("DATA", data)
+
+def row_bands(ny, nx):
+        """Slices of the row bands (about BAND_CELLS cells each) in which
+        the layers are written, so only one band is ever dense."""
+        band_rows = max(1, BAND_CELLS // max(nx, 1))
+        for row in range(0, ny, band_rows):
+            yield slice(row, min(ny, row + band_rows))
+
+
+def water_temperature_overrides(model, rows=slice(None)):
+        """Return plane 0 of water_pars as written to the static driver.
+
+        Keeps the water temperature only where it differs from the default
+        of the cell's water type; all other cells get the fill value.
+        ``rows`` selects a band of rows (default: all).
+        """
+        water_types = (model.surface_config or {}).get("water", {}).get("types", {})
+        default_lut = np.full(256, np.nan, dtype=np.float32)
+        for type_id, type_def in water_types.items():
+            default_lut[int(type_id) & 0xFF] = type_def["water_temperature"]
+
+        water_type = np.asarray(model.water_type[rows, :])
+        water_temp = np.asarray(model.water_pars[0, rows, :])
+        default_temp = default_lut[water_type.view(np.uint8)]
+        # Unknown water types have no default (NaN) and always keep their value.
+        differs = (
+            (water_type > -127)
+            & (water_temp > -9999.0)
+            & ~(np.abs(water_temp - default_temp) <= 1e-6)
+        )
+        return np.where(differs, water_temp, np.float32(-9999.0))
+
+
+def decomposition_chunks(nx, ny, npex, npey):
+        """Chunk shape (ny, nx) of one subdomain of an npex x npey PALM run.
+
+        With chunks matched to the domain decomposition, every PE reads its
+        part of the static driver from whole chunks.
+        """
+        return -(-ny // max(1, npey)), -(-nx // max(1, npex))
+
+
+def _encoding(ny, nx, compression=None, chunks=None):
+        """createVariable() keywords for the (y, x) variables."""
+        encoding = {}
+        if compression:
+            encoding.update(zlib=True, shuffle=True, complevel=int(compression))
+        if chunks is not None:
+            encoding["chunksizes"] = (
+                max(1, min(int(chunks[0]), ny)),
+                max(1, min(int(chunks[1]), nx)),
+            )
+        return encoding
+
+
+def _create_variable(nc_file, name, datatype, dimensions, fill_value, encoding,
+                     **attributes):
+        """Define a variable with the output encoding and its attributes."""
+        if "chunksizes" in encoding and len(dimensions) == 3:
+            # one (y, x) chunk per plane of a stacked variable
+            encoding = dict(encoding, chunksizes=(1,) + encoding["chunksizes"])
+        variable = nc_file.createVariable(
+            name, datatype, dimensions, fill_value=fill_value, **encoding
+        )
+        for attribute, value in attributes.items():
+            setattr(variable, attribute, value)
+        return variable
+
+
+# (y, x) driver variables: (variable, layer, datatype, fill value, layer
+# values written only above this threshold, attributes)
+SURFACE_VARIABLES = (
+        ('zt', 'zt', 'f4', -9999.0, -9999.0,
+         {'long_name': 'terrain height', 'units': 'm'}),
+        ('vegetation_type', 'vegetation_type', 'i1', -127, -1,
+         {'long_name': "vegetation type classification", 'units': "1"}),
+        ('soil_type', 'soil_type', 'i1', -127, -1,
+         {'long_name': "soil type classification", 'units': "1", 'lod': np.int32(1)}),
+        ('pavement_type', 'pavement_type', 'i1', -127, -1,
+         {'long_name': "pavement type classification", 'units': "1"}),
+        ('water_type', 'water_type', 'i1', -127, -1,
+         {'long_name': "water type classification", 'units': "1"}),
+)
+BUILDING_VARIABLES = (
+        ('building_id', 'building_id', 'i2', -127, -1,
+         {'long_name': "building ID", 'units': "1"}),
+        ('buildings_2d', 'building_height', 'f4', -9999.0, -1,
+         {'long_name': "building height", 'units': "m", 'lod': np.int32(1)}),
+        ('building_type', 'building_type', 'i1', -127, -1,
+         {'long_name': "building type classification", 'units': "1"}),
+)
+WATER_PARS_ATTRIBUTES = {
+        'long_name': "grid point specific water parameters",
+        'units': "see nwater_pars index definition",
+}
+
+
+def _driver_data(model, layer, datatype, fill_value, threshold, rows=slice(None)):
+        """Layer values above ``threshold`` in a band of ``rows``, the fill
+        value elsewhere."""
+        data = np.asarray(getattr(model, layer)[rows, :])
+        return np.where(data > threshold, data, np.dtype(datatype).type(fill_value))
+
+
+def _has_buildings(model):
+        """True if any cell has a building id; checked band by band."""
+        return any(np.any(np.asarray(model.building_id[rows, :]) > -1)
+                   for rows in row_bands(model.ny, model.nx))
+
+
+def _shift(band, rows):
+        """Rows of the file slice ``rows`` that hold model rows ``band``."""
+        return slice(rows.start + band.start, rows.start + band.stop)
+
+
+def Save(data, res, ori, surface_config, filename="quicksave", **options):
+        """Save a legacy {(row, col): pixel_dict} grid (see SaveModel)."""
         rows = [key[0] for key in data.keys()]  # Extract all row indices
         cols = [key[1] for key in data.keys()]  # Extract all column indices
 
         ny = max(rows) + 1  # Maximum row index + 1 gives number of rows
         nx = max(cols) + 1
+        model = GridModel.from_legacy_dict(data, nx, ny, res, surface_config)
+        SaveModel(model, ori, filename, **options)
+
+
+def SaveModel(model, ori, filename="quicksave", compression=None, chunks=None,
+              progress=None):
+        """Write a GridModel to a PALM static driver NetCDF file.
+
+        The layer arrays are written directly in row bands (see row_bands),
+        with no per-cell conversion; only one band of a layer is dense at a
+        time, so tiled models larger than memory can be saved.
+
+        compression: None (default, uncompressed) or a zlib level 1-9;
+            compressed variables also use the shuffle filter.
+        chunks: None (netCDF default) or the (ny, nx) chunk shape, e.g.
+            decomposition_chunks(nx, ny, npex, npey).
+        progress: optional callable(fraction, variable) called after each
+            variable is written, e.g. to report a background save.
+        """
+        nx, ny = model.nx, model.ny
         print("NX", nx)
         print("NY", ny)
         
-        dx = dy = res
-        
-        vegetation_data = np.full((ny, nx), -1) 
-        soil_data = np.full((ny, nx), -1) 
-        pavement_data = np.full((ny, nx), -1)
-        water_data = np.full((ny, nx), -1)
-        building_id_data = np.full((ny, nx), -1, dtype=np.int16)
-        building_height_data = np.full((ny, nx), -1)
-        building_type_data = np.full((ny, nx), -1)
-        height_data = np.full((ny, nx), -9999.0, dtype=np.float32)
-        
-        water_pars_data = np.full((7, ny, nx), -9999.0, dtype=np.float32)
+        dx = dy = model.res
+        encoding = _encoding(ny, nx, compression, chunks)
         
-        for (row, col), metadata in data.items():
-            #print(metadata)
-            if "zt" in metadata and metadata["zt"] is not None:
-                height_data[row, col] = metadata["zt"]
-            if "vegetation_type" in metadata and metadata["vegetation_type"] is not None:
-                vegetation_data[row, col] = metadata["vegetation_type"]
-            if "soil_type" in metadata and metadata["soil_type"] is not None:
-                soil_data[row, col] = metadata["soil_type"]
-            if "pavement_type" in metadata and metadata["pavement_type"] is not None:
-                pavement_data[row, col] = metadata["pavement_type"]
-            if "water_type" in metadata and metadata["water_type"] is not None:
-                water_data[row, col] = metadata["water_type"]
-            if "building_id" in metadata and metadata["building_id"] is not None:
-                building_id_data[row, col] = metadata["building_id"]
-            if "building_height" in metadata and metadata["building_height"] is not None:
-                building_height_data[row, col] = metadata["building_height"]
-            if "building_type" in metadata and metadata["building_type"] is not None:
-                building_type_data[row, col] = metadata["building_type"]
-                
-            # write water_pars only if temperature differs from the default of water_type
-            if metadata.get("water_type", -127) > -127:
-                water_type_value = int(metadata["water_type"])
-                water_temp = float(metadata.get("water_temperature", -9999.0))
+        has_water_pars = any(
+            np.any(water_temperature_overrides(model, rows) > -9999.0)
+            for rows in row_bands(ny, nx))
+        has_buildings = _has_buildings(model)
 
-                default_temp = float(
-                    surface_config["water"]["types"][water_type_value]["water_temperature"]
-                )
+        n_steps = (len(SURFACE_VARIABLES) + has_water_pars
+                   + has_buildings * len(BUILDING_VARIABLES))
+        steps = iter(range(1, n_steps + 1))
 
-                if water_temp > -9999.0 and abs(water_temp - default_temp) > 1e-6:
-                    water_pars_data[0, row, col] = water_temp
-                
-        # flip the data
-        # vegetation_data = np.flipud(vegetation_data)
-        # soil_data = np.flipud(soil_data)
-        # pavement_data = np.flipud(pavement_data)
-        # water_data = np.flipud(water_data)
-        # building_id_data = np.flipud(building_id_data)
-        # building_height_data = np.flipud(building_height_data)
-        # building_type_data = np.flipud(building_type_data)
-        # height_data = np.flipud(height_data)
-        
-                
-        #print("VEGETATION", vegetation_data)
+        def written(name):
+            if progress is not None:
+                progress(next(steps) / n_steps, name)
                 
         print("SAVE NETCDF")
         
@@ -83,45 +176,18 @@ def Save(data, res, ori, surface_config, filename="quicksave"):
         
 
 
-        with (Dataset(filename, 'w', format='NETCDF4') as nc_file):
+        # netCDF4 is imported on first save only, so scripts that just
+        # build or inspect a GridModel start without it
+        from netCDF4 import Dataset
+
+        with netcdf_lock, Dataset(filename, 'w', format='NETCDF4') as nc_file:
 
             # Define dimensions
             nc_file.createDimension('x', nx)
             nc_file.createDimension('y', ny)
             
-            nc_zt = nc_file.createVariable(
-            'zt', 'f4', ('y', 'x'), fill_value=-9999.0)
-            nc_zt.long_name = 'terrain height'
-            nc_zt.units = 'm'
-            nc_zt[:, :] = nc_zt._FillValue
-            
-            nc_vegetation_type = nc_file.createVariable(
-                'vegetation_type', 'i1', ('y', 'x'), fill_value=-127)
-            nc_vegetation_type.long_name = "vegetation type classification"
-            nc_vegetation_type.units = "1"
-            nc_vegetation_type[:, :] = nc_vegetation_type._FillValue
-            
-            nc_soil_type = nc_file.createVariable(
-                'soil_type', 'i1', ('y', 'x'), fill_value=-127)
-            nc_soil_type.long_name = "soil type classification"
-            nc_soil_type.units = "1"
-            nc_soil_type.lod = np.int32(1)
-            nc_soil_type[:, :] = nc_soil_type._FillValue
-            
-            nc_pavement_type = nc_file.createVariable(
-                'pavement_type', 'i1', ('y', 'x'), fill_value=-127)
-            nc_pavement_type.long_name = "pavement type classification"
-            nc_pavement_type.units = "1"
-            nc_pavement_type[:, :] = nc_pavement_type._FillValue
-            
-            nc_water_type = nc_file.createVariable(
-                'water_type', 'i1', ('y', 'x'), fill_value=-127)
-            nc_water_type.long_name = "water type classification"
-            nc_water_type.units = "1"
-            nc_water_type[:, :] = nc_water_type._FillValue
-            
             # Coordinates
-        # -----------
+            # -----------
             
             x = nc_file.createVariable('x', 'f4', ('x',))
             x.long_name = 'distance to origin in x-direction'
@@ -136,89 +202,41 @@ def Save(data, res, ori, surface_config, filename="quicksave"):
             y.axis = 'Y'
             y[:] = np.arange(0, (ny)*dy, dy) + 0.5 * dy
             
+            # Where data is > fill_value, set the data in the NetCDF file;
+            # every variable is written once, cells below get the fill value
+            for name, layer, datatype, fill_value, threshold, attributes in SURFACE_VARIABLES:
+                nc_variable = _create_variable(
+                    nc_file, name, datatype, ('y', 'x'), fill_value, encoding,
+                    **attributes)
+                for rows in row_bands(ny, nx):
+                    nc_variable[rows, :] = _driver_data(
+                        model, layer, datatype, fill_value, threshold, rows)
+                written(name)
             
-            
-            # Where data is > fill_value, set the data in the NetCDF file
-            nc_zt[:, :] = np.where(
-                height_data[:, :] > -9999.0,
-                height_data[:, :],
-                nc_zt._FillValue,
-            )
-            
-            nc_vegetation_type[:, :] = nc_vegetation_type._FillValue
-            nc_vegetation_type[:, :] = np.where(
-            vegetation_data[:, :] > -1,
-            vegetation_data[:, :],
-            nc_vegetation_type._FillValue)
-            
-            nc_soil_type[:, :] = nc_soil_type._FillValue
-            nc_soil_type[:, :] = np.where(
-            soil_data[:, :] > -1,
-            soil_data[:, :],
-            nc_soil_type._FillValue)
-            
-            nc_pavement_type[:, :] = nc_pavement_type._FillValue
-            nc_pavement_type[:, :] = np.where(
-            pavement_data[:, :] > -1,
-            pavement_data[:, :],
-            nc_pavement_type._FillValue)
-            
-            nc_water_type[:, :] = nc_water_type._FillValue
-            nc_water_type[:, :] = np.where(
-            water_data[:, :] > -1,
-            water_data[:, :],
-            nc_water_type._FillValue)
-            
-            if np.any(water_pars_data > -9999.0):
+            if has_water_pars:
                 nc_file.createDimension('nwater_pars', 7)
 
-                nc_water_pars = nc_file.createVariable(
-                    'water_pars', 'f4', ('nwater_pars', 'y', 'x'), fill_value=-9999.0
-                )
-                nc_water_pars.long_name = "grid point specific water parameters"
-                nc_water_pars.units = "see nwater_pars index definition"
-                nc_water_pars[:, :, :] = water_pars_data
+                nc_water_pars = _create_variable(
+                    nc_file, 'water_pars', 'f4', ('nwater_pars', 'y', 'x'),
+                    -9999.0, encoding, **WATER_PARS_ATTRIBUTES)
+                # Only the water temperature is set; planes 1-6 keep the
+                # fill value and need no write.
+                for rows in row_bands(ny, nx):
+                    nc_water_pars[0, rows, :] = water_temperature_overrides(model, rows)
+                written('water_pars')
             
             # Buildings
-            if np.any(building_id_data > -1):
+            if has_buildings:
                 print("BUILDINGS detected (switch on USM Namelist in PALM)")
                 
-                nc_building_id = nc_file.createVariable(
-                'building_id', 'i2', ('y', 'x'), fill_value=-127)
-                nc_building_id.long_name = "building ID"
-                nc_building_id.units = "1"
-                nc_building_id[:, :] = nc_building_id._FillValue
-                
-                nc_buildings_2d = nc_file.createVariable(
-                'buildings_2d', 'f4', ('y', 'x'), fill_value=-9999.0)
-                nc_buildings_2d.long_name = "building height"
-                nc_buildings_2d.units = "m"
-                nc_buildings_2d.lod = np.int32(1)
-                nc_buildings_2d[:, :] = nc_buildings_2d._FillValue
-                
-                nc_building_type = nc_file.createVariable(
-                'building_type', 'i1', ('y', 'x'), fill_value=-127)
-                nc_building_type.long_name = "building type classification"
-                nc_building_type.units = "1"
-                nc_building_type[:, :] = nc_building_type._FillValue
-                
-                nc_building_id[:, :] = nc_building_id._FillValue
-                nc_building_id[:, :] = np.where(
-                building_id_data[:, :] > -1,
-                building_id_data[:, :],
-                nc_building_id._FillValue)
-                
-                nc_buildings_2d[:, :] = nc_buildings_2d._FillValue
-                nc_buildings_2d[:, :] = np.where(
-                building_height_data[:, :] > -1,
-                building_height_data[:, :],
-                nc_buildings_2d._FillValue)
-                
-                nc_building_type[:, :] = nc_building_type._FillValue
-                nc_building_type[:, :] = np.where(
-                building_type_data[:, :] > -1,
-                building_type_data[:, :],
-                nc_building_type._FillValue)
+                for name, layer, datatype, fill_value, threshold, attributes in BUILDING_VARIABLES:
+                    nc_variable = _create_variable(
+                        nc_file, name, datatype, ('y', 'x'), fill_value, encoding,
+                        **attributes)
+                    for rows in row_bands(ny, nx):
+                        nc_variable[rows, :] = _driver_data(
+                            model, layer, datatype, fill_value, threshold, rows)
+                    written(name)
             
 
     
@@ -233,4 +251,55 @@ def Save(data, res, ori, surface_config, filename="quicksave"):
             nc_file.origin_z = 0.0
             nc_file.rotation_angle = 0.0
 
-        print(f"NetCDF file saved: {filename}")
\ No newline at end of file
+        print(f"NetCDF file saved: {filename}")
+
+
+def PatchModel(model, filename, window):
+        """Write a GridModel back into a window of an existing static driver.
+
+        ``window`` is the (x0, x1, y0, y1) cell window the model was loaded
+        from (see load_sd.LoadModel); the model must have exactly its size.
+        Only that window of each variable is written, the rest of the file
+        is left untouched. Variables the window needs but the file lacks
+        (water_pars, buildings) are added, filled elsewhere.
+        """
+        from netCDF4 import Dataset  # imported on first save only
+
+        print(f"Patching window {tuple(window)} of {filename}...")
+        with netcdf_lock, Dataset(filename, 'r+') as nc_file:
+            rows, cols = window_slices(
+                window, len(nc_file.dimensions['x']), len(nc_file.dimensions['y']))
+            shape = (rows.stop - rows.start, cols.stop - cols.start)
+            if (model.ny, model.nx) != shape:
+                raise ValueError(
+                    f"model is {model.ny} x {model.nx}, window is {shape[0]} x {shape[1]}")
+
+            bands = list(row_bands(model.ny, model.nx))
+            variables = list(SURFACE_VARIABLES)
+            if 'building_id' in nc_file.variables or _has_buildings(model):
+                variables += BUILDING_VARIABLES
+            for name, layer, datatype, fill_value, threshold, attributes in variables:
+                nc_variable = nc_file.variables.get(name)
+                if nc_variable is None:
+                    nc_variable = _create_variable(
+                        nc_file, name, datatype, ('y', 'x'), fill_value, {},
+                        **attributes)
+                for band in bands:
+                    nc_variable[_shift(band, rows), cols] = _driver_data(
+                        model, layer, datatype, fill_value, threshold, band)
+
+            nc_water_pars = nc_file.variables.get('water_pars')
+            if nc_water_pars is None and any(
+                    np.any(water_temperature_overrides(model, band) > -9999.0)
+                    for band in bands):
+                if 'nwater_pars' not in nc_file.dimensions:
+                    nc_file.createDimension('nwater_pars', 7)
+                nc_water_pars = _create_variable(
+                    nc_file, 'water_pars', 'f4', ('nwater_pars', 'y', 'x'),
+                    -9999.0, {}, **WATER_PARS_ATTRIBUTES)
+            if nc_water_pars is not None:
+                for band in bands:
+                    nc_water_pars[0, _shift(band, rows), cols] = (
+                        water_temperature_overrides(model, band))
+
+        print(f"NetCDF file patched: {filename}")
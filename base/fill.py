@@ -0,0 +1,128 @@
+"""
+Connected-region (flood) fill for the PALMPaint bucket tool.
+
+The region is the 4- or 8-connected set of cells sharing the surface
+class of the seed cell. Labeling uses scipy.ndimage when it is installed
+and otherwise a run-based scanline search: every row is split into runs
+of matching cells and touching runs of neighbouring rows are linked with
+NumPy, then the run graph is walked with an explicit stack, so neither
+recursion depth nor per-cell Python loops limit the region size.
+No Tkinter imports.
+
+    Copyright (C) 2025  Pierre Lampe
+    Licensed under the GNU General Public License v3 or later.
+"""
+
+import numpy as np
+
+try:
+    from scipy import ndimage
+except ImportError:  # optional, the scanline search below is used instead
+    ndimage = None
+
+
+# Class kinds; a class code is kind * CLASS_STRIDE + type value.
+NO_SURFACE, VEGETATION, PAVEMENT, BUILDING, WATER, SOIL = range(6)
+CLASS_STRIDE = 100000
+
+
+def surface_classes(model, view_mode="landcover"):
+    """Return an (ny, nx) array of surface class codes as shown in ``view_mode``.
+
+    Follows the display priority water > building > pavement > vegetation
+    (soil view: water > building > soil). Buildings are told apart by
+    building_id. The heightmap view classifies cells by terrain height.
+    """
+    if view_mode == "heightmap":
+        return model.zt
+
+    fill = model.INT_FILL
+    if view_mode == "soil":
+        classes = SOIL * CLASS_STRIDE + (model.soil_type.astype(np.int32) & 0xFF)
+    else:
+        classes = np.full((model.ny, model.nx), NO_SURFACE, dtype=np.int32)
+        has_veg = model.vegetation_type > fill
+        classes[has_veg] = (
+            VEGETATION * CLASS_STRIDE + model.vegetation_type[has_veg].astype(np.int32)
+        )
+        has_pav = model.pavement_type > fill
+        classes[has_pav] = (
+            PAVEMENT * CLASS_STRIDE + model.pavement_type[has_pav].astype(np.int32)
+        )
+
+    is_building = (model.building_id > fill) | (model.building_height > 0.0)
+    classes[is_building] = (
+        BUILDING * CLASS_STRIDE + (model.building_id[is_building].astype(np.int32) & 0xFFFF)
+    )
+    is_water = model.water_type > fill
+    classes[is_water] = WATER * CLASS_STRIDE + model.water_type[is_water].astype(np.int32)
+    return classes
+
+
+def connected_region(classes, row, col, connectivity=4):
+    """Cells connected to ``(row, col)`` that share its class.
+
+    Returns ``(rows, cols, mask)``: slices of the bounding box of the
+    region and the boolean region mask inside it.
+    """
+    if connectivity not in (4, 8):
+        raise ValueError("connectivity must be 4 or 8")
+    target = classes == classes[row, col]
+    if ndimage is not None:
+        structure = np.ones((3, 3), dtype=bool) if connectivity == 8 else None
+        labels, _ = ndimage.label(target, structure=structure)
+        region = labels == labels[row, col]
+    else:
+        region = _scanline_region(target, row, col, connectivity)
+
+    region_rows = np.flatnonzero(region.any(axis=1))
+    region_cols = np.flatnonzero(region.any(axis=0))
+    rows = slice(int(region_rows[0]), int(region_rows[-1]) + 1)
+    cols = slice(int(region_cols[0]), int(region_cols[-1]) + 1)
+    return rows, cols, region[rows, cols]
+
+
+def _scanline_region(target, row, col, connectivity):
+    """Run-based flood fill of ``target`` from ``(row, col)``."""
+    ny, nx = target.shape
+
+    # Horizontal runs of target cells, numbered 1.. in row-major order.
+    starts = target.copy()
+    starts[:, 1:] &= ~target[:, :-1]
+    run_id = np.cumsum(starts, axis=None, dtype=np.int32).reshape(ny, nx)
+    run_id[~target] = 0
+    n_runs = int(run_id.max())
+
+    # Runs touching each other between neighbouring rows; with
+    # 8-connectivity diagonal neighbours count as well.
+    pairs = [(run_id[:-1, :], run_id[1:, :])]
+    if connectivity == 8:
+        pairs += [
+            (run_id[:-1, :-1], run_id[1:, 1:]),
+            (run_id[:-1, 1:], run_id[1:, :-1]),
+        ]
+    edges = []
+    for upper, lower in pairs:
+        touching = (upper > 0) & (lower > 0)
+        edges.append(upper[touching].astype(np.int64) * (n_runs + 1) + lower[touching])
+    edges = np.unique(np.concatenate(edges))
+    a, b = np.divmod(edges, n_runs + 1)
+    a, b = np.concatenate([a, b]), np.concatenate([b, a])
+    order = np.argsort(a, kind="stable")
+    neighbours = b[order].tolist()
+    offsets = np.searchsorted(a[order], np.arange(n_runs + 2)).tolist()
+
+    # Walk the run graph with an explicit stack.
+    seed = int(run_id[row, col])
+    visited = bytearray(n_runs + 1)
+    visited[seed] = 1
+    stack = [seed]
+    while stack:
+        run = stack.pop()
+        for neighbour in neighbours[offsets[run]:offsets[run + 1]]:
+            if not visited[neighbour]:
+                visited[neighbour] = 1
+                stack.append(neighbour)
+
+    selected = np.frombuffer(bytes(visited), dtype=bool)
+    return selected[run_id]
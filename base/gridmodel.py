@@ -9,8 +9,14 @@ or a future 3D viewer.
     Licensed under the GNU General Public License v3 or later.
 """
 
+import weakref
+
 import numpy as np
 
+import base.palette as palette
+from base.snapshot import SnapshotLayer
+from base.tiles import TiledLayer
+
 
 class GridModel:
     """
@@ -26,7 +32,46 @@ class GridModel:
     INT_FILL   = -127
     FLOAT_FILL = -9999.0
 
-    def __init__(self, nx, ny, res, surface_config=None):
+    # Names of all (ny, nx) surface layers.
+    LAYERS = (
+        "zt",
+        "vegetation_type",
+        "soil_type",
+        "pavement_type",
+        "water_type",
+        "building_id",
+        "building_height",
+        "building_type",
+    )
+
+    # Initial value and dtype of each layer: bare soil everywhere.
+    LAYER_DEFAULTS = {
+        "zt":              (0.0,        np.float32),
+        "vegetation_type": (1,          np.int8),
+        "soil_type":       (1,          np.int8),
+        "pavement_type":   (INT_FILL,   np.int8),
+        "water_type":      (INT_FILL,   np.int8),
+        "building_id":     (INT_FILL,   np.int16),
+        "building_height": (FLOAT_FILL, np.float32),
+        "building_type":   (INT_FILL,   np.int8),
+        "water_pars":      (FLOAT_FILL, np.float32),
+    }
+    # Number of water parameters (PIDS nwater_pars).
+    N_WATER_PARS = 7
+
+    # Tiled storage (see base.tiles): tile edge in cells and tiles per
+    # layer kept in memory before spilling to disk.
+    TILE_SIZE = 256
+    MAX_RESIDENT_TILES = 128
+
+    # Layers that hold the fill value almost everywhere. On grids with at
+    # least SPARSE_MIN_CELLS cells they are stored as sparse TiledLayers:
+    # only blocks with real values exist. Smaller grids keep dense arrays.
+    SPARSE_LAYERS = ("water_pars",)
+    SPARSE_TILE_SIZE = 64
+    SPARSE_MIN_CELLS = 1024 * 1024
+
+    def __init__(self, nx, ny, res, surface_config=None, tiled=False):
         """
         Parameters
         ----------
@@ -36,33 +81,66 @@ class GridModel:
             Physical grid width in metres (dx = dy = res).
         surface_config : dict, optional
             Configuration for vegetation types and categories.
+        tiled : bool, optional
+            Store layers as lazily allocated, disk-backed TiledLayers
+            instead of dense arrays, for domains larger than memory.
         """
         self.nx  = nx
         self.ny  = ny
         self.res = res  # physical resolution in metres
         self.show_grid_lines = True
         self.surface_config = surface_config
+        self.tiled = tiled
 
         # Default: bare soil everywhere
-        self.zt = np.full((ny, nx), 0.0, dtype=np.float32)
-        self.vegetation_type = np.full((ny, nx), 1,              dtype=np.int8)
-        self.soil_type       = np.full((ny, nx), 1,              dtype=np.int8)
-        self.pavement_type   = np.full((ny, nx), self.INT_FILL,  dtype=np.int8)
-        self.water_type      = np.full((ny, nx), self.INT_FILL,  dtype=np.int8)
-        self.building_id     = np.full((ny, nx), self.INT_FILL,  dtype=np.int16)
-        self.building_height = np.full((ny, nx), self.FLOAT_FILL, dtype=np.float32)
-        self.building_type   = np.full((ny, nx), self.INT_FILL,  dtype=np.int8)
-
-        self.water_pars = np.full((7, ny, nx), self.FLOAT_FILL, dtype=np.float32)
+        for name in self.LAYERS + ("water_pars",):
+            setattr(self, name, self.default_layer(name))
         # Future USM per-surface properties — populated by 3D editor?
         #self.building_surface_pars = {}
+
+        # Bounding box [row0, row1, col0, col1) of cells written since the
+        # last pop_dirty(); None while nothing is pending.
+        self._dirty = None
+        # Undo recorder (EditHistory) notified before each write, if set.
+        self.recorder = None
+        # Copy-on-write layers of live snapshots; they save rows before
+        # this model overwrites them.
+        self._snapshot_layers = weakref.WeakSet()
+
+    def layer_shape(self, name):
+        """Array shape of layer ``name`` (water_pars has a leading parameter axis)."""
+        if name == "water_pars":
+            return (self.N_WATER_PARS, self.ny, self.nx)
+        return (self.ny, self.nx)
+
+    def default_layer(self, name):
+        """Return a new array for layer ``name`` filled with its default value."""
+        value, dtype = self.LAYER_DEFAULTS[name]
+        if self.is_sparse(name) and not self.tiled:
+            return TiledLayer(
+                self.layer_shape(name), dtype, value,
+                tile_size=self.SPARSE_TILE_SIZE, max_tiles=None,
+            )
+        if self.tiled:
+            return TiledLayer(
+                self.layer_shape(name), dtype, value,
+                tile_size=self.TILE_SIZE, max_tiles=self.MAX_RESIDENT_TILES,
+            )
+        return np.full(self.layer_shape(name), value, dtype=dtype)
+
+    def is_sparse(self, name):
+        """True if layer ``name`` is kept as a sparse TiledLayer on this grid."""
+        return name in self.SPARSE_LAYERS and self.nx * self.ny >= self.SPARSE_MIN_CELLS
+
     def clear_water_parameters(self, row, col):
         """Reset all water parameters for one pixel."""
+        self._touch_cell(row, col)
         self.water_pars[:, row, col] = self.FLOAT_FILL   
          
     # Helper methods for surface config access
     def set_water_parameter(self, par_index, row, col, value):
         """Set one water parameter for a single pixel."""
+        self._touch_cell(row, col)
         self.water_pars[par_index, row, col] = value
 
     def get_water_parameter(self, par_index, row, col):
@@ -90,6 +168,7 @@ class GridModel:
             "building_height": self.building_height,
             "building_type":   self.building_type,
         }
+        self._touch_cell(row, col)
         for key, value in kwargs.items():
             if key in layer_map:
                 layer_map[key][row, col] = value
@@ -111,6 +190,239 @@ class GridModel:
             "water_temperature": float(self.water_pars[0, row, col]),
         }
 
+    def write_region(self, rows, cols, mask=None, **values):
+        """Assign layer values to the window ``[rows, cols]`` in one go.
+
+        ``rows``/``cols`` are slices; ``mask`` is an optional boolean array
+        of the window shape selecting the cells to write. Keys are layer
+        names, ``water_temperature`` (water_pars plane 0) or ``water_pars``
+        (all planes). Values are scalars or arrays of the window shape.
+        Unknown keys are ignored, as in set_pixel().
+        """
+        rows = slice(*rows.indices(self.ny))
+        cols = slice(*cols.indices(self.nx))
+        if rows.stop <= rows.start or cols.stop <= cols.start:
+            return
+        if mask is not None and not mask.any():
+            return
+        self._touch(rows, cols, mask)
+        for key, value in values.items():
+            if key in self.LAYERS:
+                layer, index = getattr(self, key), (rows, cols)
+            elif key == "water_temperature":
+                layer, index = self.water_pars, (0, rows, cols)
+            elif key == "water_pars":
+                layer, index = self.water_pars, (slice(None), rows, cols)
+            else:
+                continue
+            if mask is None:
+                layer[index] = value
+                continue
+            target = layer[index]
+            np.copyto(target, value, casting="unsafe", where=mask)
+            if not isinstance(layer, np.ndarray):
+                layer[index] = target  # tiled layers return copies
+
+    # ------------------------------------------------------------------
+    # Dirty-region tracking
+    # ------------------------------------------------------------------
+
+    def mark_dirty(self, row0, row1, col0, col1):
+        """Grow the dirty bounding box by the half-open cell range."""
+        dirty = self._dirty
+        if dirty is None:
+            self._dirty = [int(row0), int(row1), int(col0), int(col1)]
+            return
+        dirty[0] = min(dirty[0], int(row0))
+        dirty[1] = max(dirty[1], int(row1))
+        dirty[2] = min(dirty[2], int(col0))
+        dirty[3] = max(dirty[3], int(col1))
+
+    def mark_all_dirty(self):
+        """Flag the whole domain for repainting."""
+        self._dirty = [0, self.ny, 0, self.nx]
+
+    def pop_dirty(self):
+        """Return the dirty region as ``(row_slice, col_slice)`` and reset it.
+
+        Returns None if nothing has been written since the last call.
+        """
+        dirty = self._dirty
+        self._dirty = None
+        if dirty is None:
+            return None
+        row0, row1, col0, col1 = dirty
+        return slice(max(0, row0), min(self.ny, row1)), slice(max(0, col0), min(self.nx, col1))
+
+    def _touch(self, rows, cols, mask=None):
+        """Announce a write to the window ``[rows, cols]`` (optionally masked).
+
+        Lets the undo recorder save old values and grows the dirty box.
+        Must be called before the layers are modified.
+        """
+        if self.recorder is not None:
+            self.recorder.capture(self, rows, cols, mask)
+        self._preserve(rows)
+        self.mark_dirty(rows.start, rows.stop, cols.start, cols.stop)
+
+    def _touch_cell(self, row, col):
+        self._touch(slice(row, row + 1), slice(col, col + 1))
+
+    def write_band(self, rows, layers):
+        """Write full rows ``rows`` of several layers, e.g. a band read by
+        load_sd.read_bands(). Not recorded for undo; marks the band dirty.
+        """
+        self._preserve(rows)
+        for name, values in layers.items():
+            if name == "water_pars":
+                self.water_pars[:, rows, :] = values
+            else:
+                getattr(self, name)[rows, :] = values
+        self.mark_dirty(rows.start, rows.stop, 0, self.nx)
+
+    # ------------------------------------------------------------------
+    # Bulk access by flat cell index (used by the undo history)
+    # ------------------------------------------------------------------
+
+    def gather(self, flat):
+        """Return ``{layer: values}`` for the cells at flat indices ``flat``.
+
+        ``water_pars`` values have shape (7, len(flat)).
+        """
+        rows, cols = np.divmod(flat, self.nx)
+        values = {name: getattr(self, name)[rows, cols] for name in self.LAYERS}
+        values["water_pars"] = self.water_pars[:, rows, cols]
+        return values
+
+    def scatter(self, flat, values):
+        """Write ``{layer: values}`` (as returned by gather) back to the grid."""
+        if len(flat) == 0:
+            return
+        rows, cols = np.divmod(flat, self.nx)
+        self._preserve(rows)
+        for name, layer_values in values.items():
+            if name == "water_pars":
+                self.water_pars[:, rows, cols] = layer_values
+            else:
+                getattr(self, name)[rows, cols] = layer_values
+        self.mark_dirty(rows.min(), rows.max() + 1, cols.min(), cols.max() + 1)
+
+    def _preserve(self, rows):
+        """Let live snapshots save ``rows`` (a slice or row indices) before
+        they are written."""
+        for layer in list(self._snapshot_layers):
+            layer.preserve(rows)
+
+    def snapshot(self):
+        """Return a frozen copy of the model, e.g. for a background save.
+
+        Nothing is copied up front. Tiled layers give copy-on-write
+        TiledLayer snapshots that copy a tile only before it is first
+        written. All other layers (including memory-mapped ones) become
+        SnapshotLayers, which save rows only when this model writes them
+        while the snapshot is alive; writes to those must therefore go
+        through the model's methods.
+        """
+        layers = {}
+        for name in self.LAYER_DEFAULTS:
+            layer = getattr(self, name)
+            if isinstance(layer, TiledLayer):
+                layers[name] = layer.snapshot()
+            else:
+                layers[name] = SnapshotLayer(layer)
+                self._snapshot_layers.add(layers[name])
+        model = GridModel.from_arrays(self.nx, self.ny, self.res, self.surface_config, **layers)
+        model.tiled = self.tiled
+        return model
+
+    # ------------------------------------------------------------------
+    # Resampling
+    # ------------------------------------------------------------------
+
+    def resample(self, new_res):
+        """Return a copy of the model on a grid of resolution ``new_res``.
+
+        Coarsening by an integer factor k works on k x k blocks: each
+        block takes its most frequent surface class (as in the landcover
+        view, buildings told apart by id) and copies the categorical
+        layers, soil_type and water_pars from one cell of that class, so
+        the surface layers stay consistent. zt becomes the block mean of
+        the valid heights, building_height the maximum over the cells of
+        the chosen class. Cells that do not fill a whole block at the
+        north/east edge are dropped. Any other resolution samples all
+        layers at the nearest cell.
+        """
+        new_res = float(new_res)
+        if new_res <= 0.0:
+            raise ValueError(f"resolution must be positive, got {new_res}")
+        factor = new_res / self.res
+        block = int(round(factor))
+        if block >= 2 and abs(factor - block) < 1e-6:
+            return self._coarsen(block)
+        return self._resample_nearest(new_res)
+
+    def _resampled(self, nx, ny, res, values):
+        """Build a model from gathered (ny * nx) cell values."""
+        layers = {name: values[name].reshape(ny, nx) for name in self.LAYERS}
+        layers["water_pars"] = values["water_pars"].reshape(self.N_WATER_PARS, ny, nx)
+        return GridModel.from_arrays(nx, ny, res, self.surface_config, **layers)
+
+    def _resample_nearest(self, new_res):
+        scale = new_res / self.res
+        nx = max(1, int(round(self.nx / scale)))
+        ny = max(1, int(round(self.ny / scale)))
+        rows = np.minimum(((np.arange(ny) + 0.5) * scale).astype(np.intp), self.ny - 1)
+        cols = np.minimum(((np.arange(nx) + 0.5) * scale).astype(np.intp), self.nx - 1)
+        flat = (rows[:, None] * self.nx + cols[None, :]).ravel()
+        return self._resampled(nx, ny, new_res, self.gather(flat))
+
+    def _coarsen(self, block):
+        # imported here: base.fill is a painting helper built on GridModel
+        from base.fill import surface_classes
+
+        nx, ny = self.nx // block, self.ny // block
+        if nx == 0 or ny == 0:
+            raise ValueError(f"a {self.nx} x {self.ny} grid is smaller than one block")
+
+        def blocks(array):
+            """(ny * nx, block * block) view: one row per block."""
+            array = np.asarray(array[:ny * block, :nx * block])
+            return (array.reshape(ny, block, nx, block)
+                    .swapaxes(1, 2).reshape(ny * nx, block * block))
+
+        # Block mode of the class codes: the longest run of each sorted row.
+        classes = blocks(surface_classes(self))
+        ordered = np.sort(classes, axis=1)
+        position = np.arange(block * block, dtype=np.min_scalar_type(block * block))
+        run_start = np.zeros(ordered.shape, dtype=position.dtype)
+        run_start[:, 1:] = np.where(ordered[:, 1:] != ordered[:, :-1], position[1:], 0)
+        run_length = position - np.maximum.accumulate(run_start, axis=1)
+        mode = ordered[np.arange(len(ordered)), run_length.argmax(axis=1)]
+
+        # Representative: the first cell of the block with the mode class.
+        matching = classes == mode[:, None]
+        block_row, block_col = np.divmod(np.arange(ny * nx), nx)
+        cell_row, cell_col = np.divmod(matching.argmax(axis=1), block)
+        flat = (block_row * block + cell_row) * self.nx + block_col * block + cell_col
+        values = self.gather(flat)
+
+        zt = blocks(self.zt)
+        valid = zt > self.FLOAT_FILL
+        count = valid.sum(axis=1)
+        total = np.where(valid, zt, 0.0).sum(axis=1, dtype=np.float64)
+        values["zt"] = np.where(
+            count > 0, total / np.maximum(count, 1), self.FLOAT_FILL
+        ).astype(np.float32)
+        values["building_height"] = np.where(
+            matching, blocks(self.building_height), -np.inf
+        ).max(axis=1).astype(np.float32)
+
+        return self._resampled(nx, ny, self.res * block, values)
+
+    # ------------------------------------------------------------------
+    # Per-cell colour lookup
+    # ------------------------------------------------------------------
+
     def get_height_range(self):
         """Return min/max terrain height for grayscale normalization."""
         valid = self.zt[self.zt >= 0.0]
@@ -125,34 +437,12 @@ class GridModel:
     @staticmethod
     def _terrain_palette(levels):
         """Create a terrain-like palette (green to brown), excluding blue."""
-        # Anchor colors inspired by matplotlib terrain, restricted to land tones.
-        anchors = [
-            (0x2E, 0x8B, 0x57),  # sea green
-            (0x7F, 0xB0, 0x69),  # grass/sage
-            (0xC8, 0xC6, 0x7A),  # dry grass
-            (0xB8, 0x92, 0x5A),  # ochre
-            (0x8B, 0x5A, 0x2B),  # brown
-        ]
+        return palette.terrain_palette(levels)
 
-        levels = max(1, int(levels))
-        if levels == 1:
-            r, g, b = anchors[-1]
-            return [f"#{r:02x}{g:02x}{b:02x}"]
-
-        palette = []
-        segments = len(anchors) - 1
-        for idx in range(levels):
-            pos = idx / (levels - 1)
-            seg_pos = pos * segments
-            seg_idx = min(segments - 1, int(seg_pos))
-            frac = seg_pos - seg_idx
-            c0 = anchors[seg_idx]
-            c1 = anchors[seg_idx + 1]
-            r = int(round(c0[0] + (c1[0] - c0[0]) * frac))
-            g = int(round(c0[1] + (c1[1] - c0[1]) * frac))
-            b = int(round(c0[2] + (c1[2] - c0[2]) * frac))
-            palette.append(f"#{r:02x}{g:02x}{b:02x}")
-        return palette
+    @property
+    def color_tables(self):
+        """Compiled colour lookup tables of the current surface configuration."""
+        return palette.color_tables(self.surface_config)
 
     def get_height_color(self, row, col, z_min=0.0, z_step=1.0, levels=10):
         """Map terrain height to discrete terrain-like color levels."""
@@ -162,38 +452,17 @@ class GridModel:
 
         level_index = int((z_val - float(z_min)) // z_step)
         level_index = min(max(level_index, 0), levels - 1)
-        return self._terrain_palette(levels)[level_index]
+        return palette.terrain_palette(levels)[level_index]
 
     def get_soil_color(self, row, col):
         """Map soil type to a dedicated soil-view color."""
-        soil_type = int(self.soil_type[row, col])
-        soil_section = self.surface_config.get("soil", {})
-        soil_types = soil_section.get("types", {})
-        soil_def = soil_types.get(soil_type, {})
-        display = soil_def.get("display", {})
-        color = display.get("color")
-        if color:
-            return color
-
-        # Fallback palette for soils if no display color is configured.
-        fallback = {
-            1: "#c2b280",  # coarse
-            2: "#b49a6a",  # medium
-            3: "#9f8458",  # medium-fine
-            4: "#8b6f47",  # fine
-            5: "#6e5438",  # very fine
-            6: "#4f3c2c",  # organic
-        }
-        return fallback.get(soil_type, "#8f7a5a")
+        tables = self.color_tables
+        return tables.color(tables.soil, self.soil_type[row, col])
 
     def get_water_color(self, row, col):
         """Resolve water color from surface configuration."""
-        water_type = int(self.water_type[row, col])
-        water_section = self.surface_config.get("water", {})
-        water_types = water_section.get("types", {})
-        water_def = water_types.get(water_type, {})
-        display = water_def.get("display", {})
-        return display.get("color", "blue")
+        tables = self.color_tables
+        return tables.color(tables.water, self.water_type[row, col])
 
     def get_color(
         self,
@@ -213,40 +482,82 @@ class GridModel:
         if view_mode == "heightmap":
             return self.get_height_color(row, col, z_min=z_min, z_step=z_step, levels=levels)
 
-        if view_mode == "soil":
-            if self.water_type[row, col] > self.INT_FILL:
-                return self.get_water_color(row, col)
-            if self.building_id[row, col] > self.INT_FILL or self.building_height[row, col] > 0.0:
-                return "black"
-            return self.get_soil_color(row, col)
-
-        if self.water_type[row, col] > self.INT_FILL:
-            return self.get_water_color(row, col)
+        tables = self.color_tables
+        water_type = self.water_type[row, col]
+        if water_type > self.INT_FILL:
+            return tables.color(tables.water, water_type)
         # Robust building detection for legacy files with wrapped building_id values.
         if self.building_id[row, col] > self.INT_FILL or self.building_height[row, col] > 0.0:
             return "black"
-        if self.pavement_type[row, col] > self.INT_FILL:
-            pav_type = int(self.pavement_type[row, col])
-            
-            pavement_section = self.surface_config.get("pavement", {})
-            pavement_types = pavement_section.get("types", {})
-            pavement_def = pavement_types.get(pav_type, {})
-            display = pavement_def.get("display", {})
-            color = display.get("color")
-            if color:
-                return color
-        if self.vegetation_type[row, col] > self.INT_FILL:
-            veg_type = int(self.vegetation_type[row, col])
-            
-            vegetation_section = self.surface_config.get("vegetation", {})
-            vegetation_types = vegetation_section.get("types", {})
-            vegetation_def = vegetation_types.get(veg_type, {})
-            display = vegetation_def.get("display", {})
-            color = display.get("color")
+        if view_mode == "soil":
+            return tables.color(tables.soil, self.soil_type[row, col])
+
+        pav_type = self.pavement_type[row, col]
+        if pav_type > self.INT_FILL:
+            color = tables.color(tables.pavement, pav_type)
             if color:
                 return color
-            
-            return "white"  # unknown vegetation types
+        veg_type = self.vegetation_type[row, col]
+        if veg_type > self.INT_FILL:
+            return tables.color(tables.vegetation, veg_type)  # "white" if unknown
+
+    # ------------------------------------------------------------------
+    # Whole-grid colour lookup
+    # ------------------------------------------------------------------
+
+    def compute_color_indices(
+        self,
+        view_mode="landcover",
+        z_min=0.0,
+        z_max=None,
+        z_step=1.0,
+        levels=10,
+        rows=slice(None),
+        cols=slice(None),
+    ):
+        """Derive palette indices for the whole grid at once.
+
+        Vectorised counterpart of get_color(). Returns ``(indices, palette)``
+        where ``indices`` is an (ny, nx) int16 array of positions into the
+        ``palette`` list of colour strings. Pass ``rows``/``cols`` slices to
+        restrict the lookup to a window of the grid.
+
+        Priority order:
+          water > building > pavement > vegetation > bare soil
+
+        Cells without any surface (get_color() returns None) map to "white".
+        """
+        window = (rows, cols)
+        if view_mode == "heightmap":
+            z_step = max(1e-6, float(z_step))
+            levels = max(1, int(levels))
+            z_val = np.maximum(self.zt[window], 0.0)
+            indices = np.floor_divide(z_val - float(z_min), z_step)
+            indices = np.clip(indices, 0, levels - 1).astype(np.int16)
+            return indices, list(palette.terrain_palette(levels))
+
+        tables = self.color_tables
+        is_water = self.water_type[window] > self.INT_FILL
+        is_building = (
+            (self.building_id[window] > self.INT_FILL)
+            | (self.building_height[window] > 0.0)
+        )
+
+        if view_mode == "soil":
+            indices = tables.soil[self.soil_type[window].view(np.uint8)]
+        else:
+            indices = np.full(is_water.shape, tables.WHITE, dtype=np.int16)
+            has_veg = self.vegetation_type[window] > self.INT_FILL
+            indices[has_veg] = tables.vegetation[self.vegetation_type[window].view(np.uint8)[has_veg]]
+
+            pav_idx = tables.pavement[self.pavement_type[window].view(np.uint8)]
+            has_pav = (self.pavement_type[window] > self.INT_FILL) & (pav_idx >= 0)
+            indices[has_pav] = pav_idx[has_pav]
+
+        indices[is_building] = tables.BLACK
+        water_idx = tables.water[self.water_type[window].view(np.uint8)]
+        indices[is_water] = water_idx[is_water]
+        return indices, tables.colors
 
     # ------------------------------------------------------------------
     # Compatibility helpers (used by create_sd, load_sd, report)
@@ -263,6 +574,43 @@ class GridModel:
                 data[(row, col)] = self.get_pixel(row, col)
         return data
 
+    @classmethod
+    def from_arrays(cls, nx, ny, res, surface_config=None, **layers):
+        """Build a GridModel from whole layer arrays, e.g. read from NetCDF.
+
+        Keyword names are layer names (see LAYERS) plus ``water_pars``.
+        Arrays are cast to the layer dtype, copying only if needed (so
+        memory-mapped arrays stay mapped); missing layers get their
+        defaults. In-memory arrays for SPARSE_LAYERS are converted to
+        sparse TiledLayers on large grids (see is_sparse).
+        """
+        unknown = set(layers) - set(cls.LAYER_DEFAULTS)
+        if unknown:
+            raise ValueError(f"Unknown layers: {', '.join(sorted(unknown))}")
+
+        # Start empty so given layers are never allocated twice.
+        model = cls(0, 0, res, surface_config)
+        model.nx, model.ny = nx, ny
+        for name, (_, dtype) in cls.LAYER_DEFAULTS.items():
+            if name not in layers:
+                setattr(model, name, model.default_layer(name))
+                continue
+            array = given = layers[name]
+            if not isinstance(array, (TiledLayer, SnapshotLayer)) or array.dtype != dtype:
+                array = np.ascontiguousarray(array, dtype=dtype)
+            expected = model.layer_shape(name)
+            if array.shape != expected:
+                raise ValueError(
+                    f"{name}: expected shape {expected}, got {array.shape}"
+                )
+            if model.is_sparse(name) and not isinstance(given, (np.memmap, TiledLayer, SnapshotLayer)):
+                array = TiledLayer.from_array(
+                    array, cls.LAYER_DEFAULTS[name][0],
+                    tile_size=cls.SPARSE_TILE_SIZE, max_tiles=None,
+                )
+            setattr(model, name, array)
+        return model
+
     @classmethod
     def from_legacy_dict(cls, pixel_dict, nx, ny, res, surface_config=None):
         """Build a GridModel from the {(row, col): pixel_dict} format
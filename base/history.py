@@ -0,0 +1,196 @@
+"""
+Patch-based undo/redo history for the PALMPaint grid.
+
+Instead of keeping a deep copy of the whole GridModel per edit, every
+stroke is stored as a patch holding only the cells that changed, per
+layer, together with their old and new values. The total size of all
+patches is bounded by a memory budget; the oldest entries are dropped
+first.
+
+    Copyright (C) 2025  Pierre Lampe
+    Licensed under the GNU General Public License v3 or later.
+"""
+
+from collections import deque
+
+import numpy as np
+
+from base.tiles import TiledLayer
+
+
+class Patch:
+    """Changed cells of one stroke.
+
+    ``layers`` maps a layer name to ``(flat_indices, before, after)``.
+    For ``water_pars`` the value arrays have shape (7, n).
+    """
+
+    def __init__(self, layers):
+        self.layers = layers
+        self.nbytes = sum(
+            idx.nbytes + before.nbytes + after.nbytes
+            for idx, before, after in layers.values()
+        )
+
+    def apply(self, model, reverse=False):
+        """Write the patch values into ``model`` (old values if ``reverse``)."""
+        for name, (idx, before, after) in self.layers.items():
+            model.scatter(idx, {name: before if reverse else after})
+
+
+class EditHistory:
+    """Undo/redo stacks of Patch objects with a memory budget.
+
+    Usage: call begin() before a stroke modifies the model and commit()
+    once it is finished. The model reports every write window to
+    capture() while a stroke is open, so old values are saved the first
+    time each cell is touched.
+
+    Parameters
+    ----------
+    max_bytes : int
+        Upper bound for the summed size of all stored patches.
+    listener : callable, optional
+        Called as ``listener(patch, reverse)`` after a patch has been
+        committed (reverse False), undone (True) or redone (False), e.g.
+        to journal the edit.
+    """
+
+    def __init__(self, max_bytes=256 * 1024 ** 2, listener=None):
+        self.max_bytes = int(max_bytes)
+        self.listener = listener
+        self.undo_stack = deque()
+        self.redo_stack = deque()
+        self.nbytes = 0
+
+        self._model = None
+        self._touched = None
+        self._indices = []
+        self._before = []
+
+    # ------------------------------------------------------------------
+    # Recording
+    # ------------------------------------------------------------------
+
+    def begin(self, model):
+        """Start recording a stroke on ``model``."""
+        if self._model is not None:
+            self.commit()
+        self._model = model
+        if getattr(model, "tiled", False):
+            self._touched = TiledLayer(
+                (model.ny, model.nx), bool, False,
+                tile_size=model.TILE_SIZE, max_tiles=model.MAX_RESIDENT_TILES,
+            )
+        else:
+            self._touched = np.zeros((model.ny, model.nx), dtype=bool)
+        self._indices = []
+        self._before = []
+        model.recorder = self
+
+    def capture(self, model, rows, cols, mask=None):
+        """Save old values of cells in ``[rows, cols]`` not yet seen this stroke.
+
+        ``mask`` optionally restricts the window to the cells that are
+        about to be written.
+        """
+        window = self._touched[rows, cols]
+        new = ~window if mask is None else (mask & ~window)
+        if not new.any():
+            return
+        self._touched[rows, cols] = window | new
+        r, c = np.nonzero(new)
+        flat = (r + rows.start) * model.nx + (c + cols.start)
+        self._indices.append(flat)
+        self._before.append(model.gather(flat))
+
+    def commit(self):
+        """Finish the open stroke and push its patch on the undo stack."""
+        model = self._model
+        if model is None:
+            return
+        model.recorder = None
+        self._model = None
+        self._touched = None
+        if not self._indices:
+            return
+
+        flat = np.concatenate(self._indices)
+        after = model.gather(flat)
+        layers = {}
+        for name, new_values in after.items():
+            old_values = np.concatenate([b[name] for b in self._before], axis=-1)
+            changed = old_values != new_values
+            if changed.ndim > 1:
+                changed = changed.any(axis=0)
+            if changed.any():
+                layers[name] = (
+                    flat[changed], old_values[..., changed], new_values[..., changed]
+                )
+        self._indices = []
+        self._before = []
+        if not layers:
+            return
+
+        self._clear_redo()
+        patch = Patch(layers)
+        self.undo_stack.append(patch)
+        self.nbytes += patch.nbytes
+        self._evict()
+        self._notify(patch)
+
+    # ------------------------------------------------------------------
+    # Undo / redo
+    # ------------------------------------------------------------------
+
+    def undo(self, model):
+        """Revert the latest patch in place. Returns False if there is none."""
+        self.commit()
+        if not self.undo_stack:
+            return False
+        patch = self.undo_stack.pop()
+        patch.apply(model, reverse=True)
+        self.redo_stack.append(patch)
+        self._notify(patch, reverse=True)
+        return True
+
+    def redo(self, model):
+        """Re-apply the latest undone patch. Returns False if there is none."""
+        self.commit()
+        if not self.redo_stack:
+            return False
+        patch = self.redo_stack.pop()
+        patch.apply(model)
+        self.undo_stack.append(patch)
+        self._notify(patch)
+        return True
+
+    def clear(self):
+        """Drop all history, e.g. after a new grid has been created or loaded."""
+        if self._model is not None:
+            self._model.recorder = None
+            self._model = None
+        self._touched = None
+        self._indices = []
+        self._before = []
+        self.undo_stack.clear()
+        self.redo_stack.clear()
+        self.nbytes = 0
+
+    def _notify(self, patch, reverse=False):
+        if self.listener is not None:
+            self.listener(patch, reverse)
+
+    # ------------------------------------------------------------------
+    # Memory budget
+    # ------------------------------------------------------------------
+
+    def _clear_redo(self):
+        for patch in self.redo_stack:
+            self.nbytes -= patch.nbytes
+        self.redo_stack.clear()
+
+    def _evict(self):
+        """Drop the oldest undo entries until the budget is met."""
+        while self.nbytes > self.max_bytes and len(self.undo_stack) > 1:
+            self.nbytes -= self.undo_stack.popleft().nbytes
@@ -0,0 +1,409 @@
+"""
+Autosave journal and crash recovery for PALMPaint sessions.
+
+Every running PALMPaint keeps its autosave in a session directory of its
+own below the autosave root (by default ~/.palmpaint/autosave):
+
+    session.lock      locked by the owning process while it runs
+    autosave.ppaint   a project file (see base.project), the base of the
+                      journal
+    autosave.journal  an append-only log of every edit applied since the
+                      base was written or last compacted
+
+The operating system releases the lock when the process ends, however it
+ends. A session directory whose lock can be taken therefore belongs to a
+PALMPaint that did not exit cleanly; find_orphan() returns it for
+recovery. A clean exit deletes the session directory.
+
+An edit is journaled as the cells it changed: for every layer the flat
+cell indices and the values written. Strokes, bucket fills and height
+tools all end up as such a patch in the undo history (base.history);
+undo and redo are journaled as the values they write back. Replaying the
+records in order on the base therefore restores the session, and a
+record is usually only a few kilobytes.
+
+Journal file layout (little endian):
+
+    header   magic (8 bytes), journal id (16 bytes), nx, ny (uint64)
+    record   payload length (uint32), CRC32 of the payload (uint32),
+             payload: number of layers (uint8), then per layer
+             name (16 bytes), dtype (4 bytes), planes (uint8),
+             count n (uint64), n int64 flat indices and planes x n values
+
+The base is written in full only for a new or loaded model; it stores
+the id of the journal started with it in its view settings, so a journal
+left over from an older base is never replayed on a newer one. Periodic
+compaction replays the journal into the base file in place and then
+empties the journal. Records write absolute values, so replaying a
+journal again on a base that already holds some or all of its edits
+gives the same result: a crash during compaction loses nothing. A record
+cut short by a crash fails its length or checksum test and ends the
+replay.
+
+All file I/O runs on a background thread; record(), snapshot() and
+compact() only queue their work. No Tkinter imports.
+
+    Copyright (C) 2025  Pierre Lampe
+    Licensed under the GNU General Public License v3 or later.
+"""
+
+import atexit
+import os
+import queue
+import struct
+import threading
+import uuid
+import zlib
+
+import numpy as np
+
+from base.project import LoadProject, SaveProject, read_project_header
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+MAGIC = b"PPJRNL\x00\x01"
+SNAPSHOT_NAME = "autosave.ppaint"
+JOURNAL_NAME = "autosave.journal"
+LOCK_NAME = "session.lock"
+DEFAULT_DIRECTORY = os.path.join(os.path.expanduser("~"), ".palmpaint", "autosave")
+
+_HEADER = struct.Struct("<8s16sQQ")
+_RECORD = struct.Struct("<II")
+_COUNT = struct.Struct("<B")
+_LAYER = struct.Struct("<16s4sBQ")
+
+
+def _paths(directory):
+    return os.path.join(directory, SNAPSHOT_NAME), os.path.join(directory, JOURNAL_NAME)
+
+
+def _lock_session(directory):
+    """Open and lock the session lock file. Returns the open file, or None
+    if another process holds the lock."""
+    file = open(os.path.join(directory, LOCK_NAME), "a+")
+    try:
+        if fcntl is not None:
+            fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            file.seek(0)
+            msvcrt.locking(file.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        file.close()
+        return None
+    return file
+
+
+def encode_record(layers):
+    """Payload of one record; ``layers`` is a list of (name, flat, values)."""
+    parts = [_COUNT.pack(len(layers))]
+    for name, flat, values in layers:
+        values = np.ascontiguousarray(values)
+        planes = 1 if values.ndim == 1 else values.shape[0]
+        parts.append(_LAYER.pack(
+            name.encode("ascii"), values.dtype.str.encode("ascii"), planes, len(flat)
+        ))
+        parts.append(np.ascontiguousarray(flat, dtype="<i8").tobytes())
+        parts.append(values.tobytes())
+    return b"".join(parts)
+
+
+def decode_record(payload):
+    """Inverse of encode_record(): a list of (name, flat, values)."""
+    (count,), offset = _COUNT.unpack_from(payload), _COUNT.size
+    layers = []
+    for _ in range(count):
+        name, dtype, planes, n = _LAYER.unpack_from(payload, offset)
+        offset += _LAYER.size
+        flat = np.frombuffer(payload, dtype="<i8", count=n, offset=offset)
+        offset += flat.nbytes
+        dtype = np.dtype(dtype.rstrip(b"\x00").decode("ascii"))
+        values = np.frombuffer(payload, dtype=dtype, count=planes * n, offset=offset)
+        offset += values.nbytes
+        if planes > 1:
+            values = values.reshape(planes, n)
+        layers.append((name.rstrip(b"\x00").decode("ascii"), flat, values))
+    return layers
+
+
+def read_records(filename, journal_id=None):
+    """Yield the records of a journal file as lists of (name, flat, values).
+
+    Returns without yielding if the file is missing or belongs to another
+    journal than ``journal_id`` (a hex string); stops at the first
+    incomplete or corrupt record.
+    """
+    try:
+        file = open(filename, "rb")
+    except FileNotFoundError:
+        return
+    with file:
+        header = file.read(_HEADER.size)
+        if len(header) < _HEADER.size:
+            return
+        magic, file_id, _, _ = _HEADER.unpack(header)
+        if magic != MAGIC or (journal_id is not None and file_id.hex() != journal_id):
+            return
+        while True:
+            prefix = file.read(_RECORD.size)
+            if len(prefix) < _RECORD.size:
+                return
+            length, checksum = _RECORD.unpack(prefix)
+            payload = file.read(length)
+            if len(payload) < length or zlib.crc32(payload) != checksum:
+                return
+            yield decode_record(payload)
+
+
+def find_orphan(root=DEFAULT_DIRECTORY):
+    """
+    Find the newest session below ``root`` whose process has ended
+    without a clean exit. Returns a tuple (directory, lock) with the
+    session lock now held by the caller, or None.
+
+    Pass the lock on to discard() (or close it) when done. Orphaned
+    sessions that never wrote a base are deleted on the way.
+    """
+    try:
+        names = os.listdir(root)
+    except FileNotFoundError:
+        return None
+    directories = []
+    for name in names:
+        path = os.path.join(root, name)
+        try:
+            if os.path.isdir(path):
+                directories.append((os.path.getmtime(path), path))
+        except OSError:
+            continue  # deleted by its owner meanwhile
+    for _, directory in sorted(directories, reverse=True):
+        if not os.path.exists(os.path.join(directory, LOCK_NAME)):
+            continue  # a session that is just starting
+        try:
+            lock = _lock_session(directory)
+        except OSError:
+            continue  # deleted by its owner meanwhile
+        if lock is None:
+            continue  # a running PALMPaint owns it
+        if os.path.exists(_paths(directory)[0]):
+            return directory, lock
+        discard(directory, lock)
+    return None
+
+
+def recover(directory, surface_config=None):
+    """
+    Restore an autosaved session. Returns a tuple (model, ori, view, n)
+    with the number of journal records replayed, or None if there is no
+    base.
+
+    The base is memory-mapped copy-on-write like any project file, the
+    replayed edits stay in memory.
+    """
+    snapshot_path, journal_path = _paths(directory)
+    if not os.path.exists(snapshot_path):
+        return None
+    model, ori, view = LoadProject(snapshot_path, surface_config)
+    view = dict(view)
+    journal_id = view.pop("journal_id", None)
+
+    replayed = 0
+    if journal_id is not None:
+        for layers in read_records(journal_path, journal_id):
+            for name, flat, values in layers:
+                model.scatter(flat, {name: values})
+            replayed += 1
+    return model, ori, view, replayed
+
+
+def discard(directory, lock=None):
+    """Delete a session directory; ``lock`` is its held lock file, if any."""
+    if lock is not None:
+        lock.close()
+    for name in (SNAPSHOT_NAME, JOURNAL_NAME, SNAPSHOT_NAME + ".tmp", JOURNAL_NAME + ".tmp", LOCK_NAME):
+        try:
+            os.remove(os.path.join(directory, name))
+        except FileNotFoundError:
+            pass
+    try:
+        os.rmdir(directory)
+    except OSError:
+        pass  # already gone, or holds files of a newer format
+
+
+class Journal:
+    """Background writer of one session's autosave base and edit journal.
+
+    snapshot() writes a new base; record() appends an applied undo patch;
+    compact() folds the journal into the base. All return immediately, a
+    daemon thread works in call order. Records are flushed one by one and
+    synced to disk whenever the queue runs empty.
+
+    Parameters
+    ----------
+    root : str
+        Autosave root; the session directory is created below it.
+    """
+
+    def __init__(self, root=DEFAULT_DIRECTORY):
+        self.directory = os.path.join(root, f"session-{os.getpid()}-{uuid.uuid4().hex[:8]}")
+        os.makedirs(self.directory)
+        self._lock = _lock_session(self.directory)
+        self._lock.seek(0)
+        self._lock.truncate()
+        self._lock.write(str(os.getpid()))
+        self._lock.flush()
+        self.snapshot_path, self.journal_path = _paths(self.directory)
+        # Records queued since the latest snapshot or compaction.
+        self.records = 0
+        self._jobs_pending = 0
+        self._pending_lock = threading.Lock()
+        self._file = None
+        self._journal_id = None
+        self._shape = None
+        self._closed = False
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="autosave-journal", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    @property
+    def busy(self):
+        """True while a snapshot or compaction is queued or running."""
+        return self._jobs_pending > 0
+
+    def _put_job(self, item):
+        with self._pending_lock:
+            self._jobs_pending += 1
+        self._queue.put(item)
+
+    def snapshot(self, model, ori, view=None, replaces=None):
+        """Write ``model`` as the new base and start a new journal on it.
+
+        ``model`` must not change afterwards: pass GridModel.snapshot().
+        ``replaces`` is an optional (directory, lock) of a recovered
+        session, deleted once the new base is on disk.
+        """
+        if self._closed:
+            return
+        self.records = 0
+        self._put_job(("snapshot", model, ori, dict(view or {}), replaces))
+
+    def compact(self):
+        """Fold the journal into the base file and empty the journal."""
+        if self._closed:
+            return
+        self.records = 0
+        self._put_job(("compact",))
+
+    def record(self, patch, reverse=False):
+        """Append the values an undo Patch wrote (old values if ``reverse``)."""
+        if self._closed:
+            return
+        self.records += 1
+        self._queue.put(("record", [
+            (name, flat, before if reverse else after)
+            for name, (flat, before, after) in patch.layers.items()
+        ]))
+
+    def close(self, discard_files=False):
+        """Write what is queued and stop the thread. With ``discard_files``
+        (a clean exit) the session directory is deleted afterwards."""
+        if not self._closed:
+            self._closed = True
+            self._queue.put(None)
+            self._thread.join()
+        if discard_files and self._lock is not None:
+            discard(self.directory, self._lock)
+            self._lock = None
+
+    # ------------------------------------------------------------------
+    # Writer thread
+    # ------------------------------------------------------------------
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            try:
+                if item[0] == "record":
+                    self._append(item[1])
+                elif item[0] == "snapshot":
+                    self._write_snapshot(*item[1:])
+                else:
+                    self._compact()
+            except Exception as e:
+                print(f"Autosave failed: {e}")
+            finally:
+                if item[0] != "record":
+                    with self._pending_lock:
+                        self._jobs_pending -= 1
+            if self._file is not None and self._queue.empty():
+                os.fsync(self._file.fileno())
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _close_journal(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _start_journal(self):
+        """Replace the journal file by an empty one with the current id."""
+        tmp_path = f"{self.journal_path}.tmp"
+        with open(tmp_path, "wb") as file:
+            file.write(_HEADER.pack(MAGIC, self._journal_id.bytes, *self._shape))
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, self.journal_path)
+        self._file = open(self.journal_path, "ab")
+
+    def _write_snapshot(self, model, ori, view, replaces):
+        self._close_journal()
+        # The base already holds every edit of the old journal, so a
+        # crash before the new journal exists loses nothing: recover()
+        # ignores a journal whose id differs from the base's.
+        self._journal_id = uuid.uuid4()
+        self._shape = (model.nx, model.ny)
+        view["journal_id"] = self._journal_id.hex
+        SaveProject(model, ori, self.snapshot_path, view, quiet=True)
+        self._start_journal()
+        if replaces is not None:
+            discard(*replaces)
+
+    def _compact(self):
+        if self._file is None:
+            return  # no base yet
+        self._close_journal()
+        header, data_offset = read_project_header(self.snapshot_path)
+        nx = header["nx"]
+        arrays = {
+            name: np.memmap(
+                self.snapshot_path, dtype=np.dtype(entry["dtype"]), mode="r+",
+                offset=data_offset + entry["offset"], shape=tuple(entry["shape"]),
+            )
+            for name, entry in header["arrays"].items()
+        }
+        for layers in read_records(self.journal_path, self._journal_id.hex):
+            for name, flat, values in layers:
+                rows, cols = np.divmod(flat, nx)
+                arrays[name][..., rows, cols] = values
+        for array in arrays.values():
+            array.flush()
+        del arrays
+        # Only once the base holds the edits is the journal emptied; a
+        # crash before that replays it again, with the same result.
+        self._start_journal()
+
+    def _append(self, layers):
+        if self._file is None:
+            return  # no base to replay the record on
+        payload = encode_record(layers)
+        self._file.write(_RECORD.pack(len(payload), zlib.crc32(payload)) + payload)
+        self._file.flush()
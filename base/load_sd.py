@@ -5,13 +5,41 @@ This file is meant to be used with the PALMPaint application.
     Licensed under the GNU General Public License v3 or later.
 """
 
-from netCDF4 import Dataset
+import threading
+
 import numpy as np
 
-def get_2d_data(nc_file, var_name, ny, nx, fill_value=-127, dtype=None):
-    """Load a 2D variable (y, x) or return a filled fallback array."""
+from base.gridmodel import GridModel
+
+
+# The netCDF-C/HDF5 libraries are not guaranteed to be thread-safe. Every
+# NetCDF read or write in PALMPaint holds this lock, so a save running on
+# a worker thread never overlaps with another file access.
+netcdf_lock = threading.RLock()
+
+def window_slices(window, nx, ny):
+    """Clip an (x0, x1, y0, y1) cell window to the domain.
+
+    Returns ``(rows, cols)`` slices; None selects the whole domain.
+    """
+    if window is None:
+        return slice(0, ny), slice(0, nx)
+    x0, x1, y0, y1 = (int(value) for value in window)
+    x0, x1 = max(0, x0), min(nx, x1)
+    y0, y1 = max(0, y0), min(ny, y1)
+    if x1 <= x0 or y1 <= y0:
+        raise ValueError(f"window {tuple(window)} lies outside the {nx} x {ny} domain")
+    return slice(y0, y1), slice(x0, x1)
+
+
+def get_2d_data(nc_file, var_name, ny, nx, fill_value=-127, dtype=None,
+                rows=slice(None), cols=slice(None)):
+    """Load a 2D variable (y, x) or return a filled fallback array.
+
+    ``rows`` and ``cols`` select a window; ny and nx are its size.
+    """
     if var_name in nc_file.variables:
-        data = nc_file.variables[var_name][:]
+        data = nc_file.variables[var_name][rows, cols]
         if hasattr(data, "filled"):
             data = data.filled(nc_file.variables[var_name]._FillValue)
         if dtype is not None:
@@ -25,16 +53,111 @@ def get_2d_data(nc_file, var_name, ny, nx, fill_value=-127, dtype=None):
     )
 
 
-def get_pars_data(nc_file, var_name, npars, ny, nx, fill_value=-9999.0, dtype=np.float32):
+def get_pars_data(nc_file, var_name, npars, ny, nx, fill_value=-9999.0, dtype=np.float32,
+                  rows=slice(None), cols=slice(None)):
     """Load a 3D parameter variable (npars, y, x) or return a filled fallback array."""
     if var_name in nc_file.variables:
-        data = nc_file.variables[var_name][:]
+        data = nc_file.variables[var_name][:, rows, cols]
         if hasattr(data, "filled"):
             data = data.filled(nc_file.variables[var_name]._FillValue)
         return data.astype(dtype)
 
     return np.full((npars, ny, nx), fill_value, dtype=dtype)
 
+def read_layers(nc_file, ny, nx, rows=slice(None), cols=slice(None)):
+    """Read all surface layers of an open static driver as whole arrays.
+
+    ``rows`` and ``cols`` restrict the read to a window of ny x nx cells;
+    netCDF4 then only reads that part of each variable from the file.
+    Returns a dict keyed by GridModel layer names plus ``water_pars``.
+    """
+    window = {"rows": rows, "cols": cols}
+    return {
+        "vegetation_type": get_2d_data(nc_file, "vegetation_type", ny, nx, fill_value=-127, dtype=np.int8, **window),
+        "soil_type":       get_2d_data(nc_file, "soil_type", ny, nx, fill_value=-127, dtype=np.int8, **window),
+        "pavement_type":   get_2d_data(nc_file, "pavement_type", ny, nx, fill_value=-127, dtype=np.int8, **window),
+        "water_type":      get_2d_data(nc_file, "water_type", ny, nx, fill_value=-127, dtype=np.int8, **window),
+        "building_id":     get_2d_data(nc_file, "building_id", ny, nx, fill_value=-127, dtype=np.int16, **window),
+        "building_height": get_2d_data(nc_file, "buildings_2d", ny, nx, fill_value=-9999.0, dtype=np.float32, **window),
+        "building_type":   get_2d_data(nc_file, "building_type", ny, nx, fill_value=-127, dtype=np.int8, **window),
+        "zt":              get_2d_data(nc_file, "zt", ny, nx, fill_value=0.0, dtype=np.float32, **window),
+        "water_pars":      get_pars_data(nc_file, "water_pars", 7, ny, nx, fill_value=-9999.0, dtype=np.float32, **window),
+    }
+
+
+def read_header(nc_file):
+    """Return (nx, ny, res, ori) of an open static driver."""
+    nx = len(nc_file.dimensions["x"])
+    ny = len(nc_file.dimensions["y"])
+    ori = [nc_file.origin_lat, nc_file.origin_lon,
+           nc_file.origin_x, nc_file.origin_y]
+
+    # Determine resolution from the x coordinate variable.
+    # The x values are defined as: np.arange(0, nx*dx, dx) + 0.5*dx in create_sd.py
+    x = nc_file.variables["x"][:]
+    res = float(x[1] - x[0]) if nx > 1 else 1.0
+    return nx, ny, res, ori
+
+
+# Cells per row band read by read_bands().
+BAND_CELLS = 1 << 20
+
+
+def read_bands(filename, band_rows=None):
+    """
+    Read a static driver band by band. A generator: first yields the
+    header (nx, ny, res, ori), then one (rows, layers) pair per band of
+    ``band_rows`` rows (default: about BAND_CELLS cells), bottom to top.
+
+    ``rows`` is the slice of the band, ``layers`` a read_layers() dict
+    for it. The file stays open between bands, but netcdf_lock is only
+    held while reading, so other file access can run in between; close
+    the generator to stop early.
+    """
+    from netCDF4 import Dataset  # imported on first load only
+
+    with netcdf_lock:
+        nc_file = Dataset(filename, 'r')
+    try:
+        with netcdf_lock:
+            nx, ny, res, ori = read_header(nc_file)
+        yield nx, ny, res, ori
+
+        band_rows = band_rows or max(1, BAND_CELLS // max(nx, 1))
+        for row in range(0, ny, band_rows):
+            rows = slice(row, min(ny, row + band_rows))
+            with netcdf_lock:
+                layers = read_layers(nc_file, rows.stop - rows.start, nx, rows, slice(None))
+            yield rows, layers
+    finally:
+        with netcdf_lock:
+            nc_file.close()
+
+
+def LoadModel(filename="output.nc", surface_config=None, window=None):
+    """
+    Load a NetCDF static driver directly into a GridModel.
+
+    The arrays read from the file become the model layers without any
+    per-cell conversion. Returns a tuple: (model, ori).
+
+    With ``window=(x0, x1, y0, y1)`` only that block of cells (clipped to
+    the domain) is read and the model covers just the window; ori stays
+    the origin of the whole driver. create_sd.PatchModel() writes such a
+    model back into the same window of the file.
+    """
+    from netCDF4 import Dataset  # imported on first load only
+
+    with netcdf_lock, Dataset(filename, 'r') as nc_file:
+        nx, ny, res, ori = read_header(nc_file)
+        rows, cols = window_slices(window, nx, ny)
+        ny, nx = rows.stop - rows.start, cols.stop - cols.start
+        layers = read_layers(nc_file, ny, nx, rows, cols)
+
+    model = GridModel.from_arrays(nx, ny, res, surface_config, **layers)
+    return model, ori
+
+
 def Load(filename="output.nc"):
     """
     Load grid data from a NetCDF file and convert it into a dictionary
@@ -54,38 +177,21 @@ def Load(filename="output.nc"):
 
     The function also reads coordinate variables to determine the resolution.
     """
-    with Dataset(filename, 'r') as nc_file:
-        # Get dimensions
-        nx = len(nc_file.dimensions["x"])
-        ny = len(nc_file.dimensions["y"])
-        ori = [nc_file.origin_lat, nc_file.origin_lon,
-               nc_file.origin_x, nc_file.origin_y]
-
-        # Determine resolution from the x coordinate variable.
-        # The x values are defined as: np.arange(0, nx*dx, dx) + 0.5*dx in create_sd.py
-        x = nc_file.variables["x"][:]
-        res = float(x[1] - x[0]) if nx > 1 else 1.0
-
-        def get_data(var_name):
-            if var_name in nc_file.variables:
-                var = nc_file.variables[var_name][:]
-                if hasattr(var, "filled"):
-                    return var.filled(nc_file.variables[var_name]._FillValue)
-                return var
-            return np.full((ny, nx), -127)
-
-        # --- 2D fields ---
-        veg = get_2d_data(nc_file, "vegetation_type", ny, nx, fill_value=-127, dtype=np.int8)
-        soil = get_2d_data(nc_file, "soil_type", ny, nx, fill_value=-127, dtype=np.int8)
-        pav = get_2d_data(nc_file, "pavement_type", ny, nx, fill_value=-127, dtype=np.int8)
-        water = get_2d_data(nc_file, "water_type", ny, nx, fill_value=-127, dtype=np.int8)
-        bldg_id = get_2d_data(nc_file, "building_id", ny, nx, fill_value=-127, dtype=np.int16)
-        bldg_height = get_2d_data(nc_file, "buildings_2d", ny, nx, fill_value=-9999.0, dtype=np.float32)
-        bldg_type = get_2d_data(nc_file, "building_type", ny, nx, fill_value=-127, dtype=np.int8)
-        zt = get_2d_data(nc_file, "zt", ny, nx, fill_value=0.0, dtype=np.float32)
-
-        # --- parameter stacks / pars ---
-        water_pars = get_pars_data(nc_file, "water_pars", 7, ny, nx, fill_value=-9999.0, dtype=np.float32)
+    from netCDF4 import Dataset  # imported on first load only
+
+    with netcdf_lock, Dataset(filename, 'r') as nc_file:
+        nx, ny, res, ori = read_header(nc_file)
+
+        layers = read_layers(nc_file, ny, nx)
+        zt = layers["zt"]
+        veg = layers["vegetation_type"]
+        soil = layers["soil_type"]
+        pav = layers["pavement_type"]
+        water = layers["water_type"]
+        bldg_id = layers["building_id"]
+        bldg_height = layers["building_height"]
+        bldg_type = layers["building_type"]
+        water_pars = layers["water_pars"]
 
         grid = {}
         for row in range(ny):
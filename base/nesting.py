@@ -0,0 +1,145 @@
+"""
+Static drivers for nested PALM runs.
+
+A nested run needs one static driver per domain: the parent is written
+to ``<prefix>_static``, child domain N to ``<prefix>_static_N02``,
+``_N03`` and so on. A child is described by its window in parent cells
+and its grid refinement ratio:
+
+    {"window": [x0, x1, y0, y1], "ratio": 3}
+
+child_model() derives the child layers from the parent: categorical
+layers (types, building id and height, water_pars) are upsampled by
+repeating every parent cell ratio x ratio times, zt is interpolated
+bilinearly between parent cell centres. ExportNested() derives the
+children in a thread pool, one child at a time per worker, so only the
+domains being written are in memory. No Tkinter imports.
+
+    Copyright (C) 2025  Pierre Lampe
+    Licensed under the GNU General Public License v3 or later.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from base.create_sd import SaveModel, decomposition_chunks
+from base.gridmodel import GridModel
+from base.load_sd import window_slices
+
+
+def driver_filename(prefix, domain):
+    """File name of domain ``domain`` (1: parent, 2.. children)."""
+    return f"{prefix}_static" if domain == 1 else f"{prefix}_static_N{domain:02d}"
+
+
+def upsample(array, ratio):
+    """Repeat every cell of the last two axes ``ratio`` times in each direction."""
+    array = np.asarray(array)
+    return np.repeat(np.repeat(array, ratio, axis=-2), ratio, axis=-1)
+
+
+def interpolate(array, rows, cols, ratio, fill_value=-9999.0):
+    """Bilinear refinement of the ``rows``/``cols`` window of a 2D field.
+
+    Child cell centres are interpolated between the surrounding parent
+    cell centres, using parent cells just outside the window where they
+    exist. Where a surrounding parent cell holds ``fill_value`` the
+    nearest parent value is used instead.
+    """
+    ny, nx = array.shape
+
+    def axis(window, n):
+        # Position of the child cell centres in parent cell units.
+        centres = window.start + (np.arange((window.stop - window.start) * ratio) + 0.5) / ratio - 0.5
+        lower = np.clip(np.floor(centres).astype(np.intp), 0, n - 1)
+        upper = np.minimum(lower + 1, n - 1)
+        weight = np.clip(centres - lower, 0.0, 1.0).astype(np.float32)
+        return lower, upper, weight
+
+    r0, r1, wr = axis(rows, ny)
+    c0, c1, wc = axis(cols, nx)
+    block = np.asarray(array[min(r0.min(), r1.min()):max(r0.max(), r1.max()) + 1,
+                             min(c0.min(), c1.min()):max(c0.max(), c1.max()) + 1])
+    r0, r1 = r0 - r0.min(), r1 - r0.min()
+    c0, c1 = c0 - c0.min(), c1 - c0.min()
+
+    top, bottom = block[r0], block[r1]
+    corners = (top[:, c0], top[:, c1], bottom[:, c0], bottom[:, c1])
+    wr, wc = wr[:, None], wc[None, :]
+    result = (
+        corners[0] * (1 - wr) * (1 - wc) + corners[1] * (1 - wr) * wc
+        + corners[2] * wr * (1 - wc) + corners[3] * wr * wc
+    ).astype(array.dtype)
+
+    invalid = np.zeros(result.shape, dtype=bool)
+    for corner in corners:
+        invalid |= corner == fill_value
+    if invalid.any():
+        nearest = upsample(array[rows, cols], ratio)
+        result[invalid] = nearest[invalid]
+    return result
+
+
+def child_model(parent, window, ratio):
+    """Derive the GridModel of a child domain covering ``window`` of ``parent``."""
+    if int(ratio) != ratio or ratio < 1:
+        raise ValueError(f"refinement ratio must be an integer >= 1, got {ratio!r}")
+    ratio = int(ratio)
+    rows, cols = window_slices(window, parent.nx, parent.ny)
+
+    layers = {
+        name: upsample(getattr(parent, name)[rows, cols], ratio)
+        for name in GridModel.LAYERS if name != "zt"
+    }
+    layers["water_pars"] = upsample(parent.water_pars[:, rows, cols], ratio)
+    layers["zt"] = interpolate(parent.zt, rows, cols, ratio, parent.FLOAT_FILL)
+
+    return GridModel.from_arrays(
+        (cols.stop - cols.start) * ratio,
+        (rows.stop - rows.start) * ratio,
+        parent.res / ratio,
+        parent.surface_config,
+        **layers,
+    )
+
+
+def child_origin(ori, parent, window):
+    """Origin of a child domain: the parent origin shifted to the window corner."""
+    rows, cols = window_slices(window, parent.nx, parent.ny)
+    lat, lon, x, y = ori
+    return lat, lon, x + cols.start * parent.res, y + rows.start * parent.res
+
+
+def ExportNested(parent, ori, children, prefix, max_workers=None,
+                 decomposition=None, **save_options):
+    """
+    Write the static drivers of a parent and its child domains.
+
+    ``children`` is a list of {"window": (x0, x1, y0, y1), "ratio": n}
+    dicts in domain order. ``decomposition`` (npex, npey) chunks every
+    domain like its subdomains on npex x npey PEs. ``save_options`` are
+    passed to SaveModel (compression, chunks). Returns the list of
+    written file names, the parent's first.
+    """
+    def write(domain, model, origin):
+        # SaveModel holds load_sd.netcdf_lock: children are derived
+        # concurrently, the files are written one at a time.
+        filename = driver_filename(prefix, domain)
+        options = dict(save_options)
+        if decomposition:
+            options["chunks"] = decomposition_chunks(model.nx, model.ny, *decomposition)
+        SaveModel(model, origin, filename, **options)
+        return filename
+
+    def write_child(domain, child):
+        model = child_model(parent, child["window"], child.get("ratio", 1))
+        return write(domain, model, child_origin(ori, parent, child["window"]))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = [pool.submit(write, 1, parent, ori)]
+        futures += [
+            pool.submit(write_child, domain, child)
+            for domain, child in enumerate(children, start=2)
+        ]
+        return [future.result() for future in futures]
@@ -0,0 +1,134 @@
+"""
+Precompiled colour lookup tables for the PALMPaint views.
+
+The display colours of all surface types are compiled once per surface
+configuration into 256-entry lookup tables, indexed with the uint8 view
+of an int8 layer value, that point into one shared list of colour
+strings. Both the per-cell GridModel.get_color() and the vectorised
+GridModel.compute_color_indices() read from these tables instead of
+walking the configuration dict for every cell. No Tkinter imports.
+
+    Copyright (C) 2025  Pierre Lampe
+    Licensed under the GNU General Public License v3 or later.
+"""
+
+from functools import lru_cache
+
+import numpy as np
+
+
+# Soil-view colours for soil types without a configured display colour.
+SOIL_FALLBACK_COLORS = {
+    1: "#c2b280",  # coarse
+    2: "#b49a6a",  # medium
+    3: "#9f8458",  # medium-fine
+    4: "#8b6f47",  # fine
+    5: "#6e5438",  # very fine
+    6: "#4f3c2c",  # organic
+}
+SOIL_DEFAULT_COLOR = "#8f7a5a"
+WATER_DEFAULT_COLOR = "blue"
+
+
+@lru_cache(maxsize=16)
+def terrain_palette(levels):
+    """Terrain-like palette (green to brown, no blue) as a tuple of colours."""
+    # Anchor colors inspired by matplotlib terrain, restricted to land tones.
+    anchors = [
+        (0x2E, 0x8B, 0x57),  # sea green
+        (0x7F, 0xB0, 0x69),  # grass/sage
+        (0xC8, 0xC6, 0x7A),  # dry grass
+        (0xB8, 0x92, 0x5A),  # ochre
+        (0x8B, 0x5A, 0x2B),  # brown
+    ]
+
+    levels = max(1, int(levels))
+    if levels == 1:
+        r, g, b = anchors[-1]
+        return (f"#{r:02x}{g:02x}{b:02x}",)
+
+    palette = []
+    segments = len(anchors) - 1
+    for idx in range(levels):
+        pos = idx / (levels - 1)
+        seg_pos = pos * segments
+        seg_idx = min(segments - 1, int(seg_pos))
+        frac = seg_pos - seg_idx
+        c0 = anchors[seg_idx]
+        c1 = anchors[seg_idx + 1]
+        r = int(round(c0[0] + (c1[0] - c0[0]) * frac))
+        g = int(round(c0[1] + (c1[1] - c0[1]) * frac))
+        b = int(round(c0[2] + (c1[2] - c0[2]) * frac))
+        palette.append(f"#{r:02x}{g:02x}{b:02x}")
+    return tuple(palette)
+
+
+class ColorTables:
+    """Type -> colour lookup tables compiled from one surface configuration.
+
+    ``colors`` is the shared list of colour strings; ``water``, ``soil``,
+    ``vegetation`` and ``pavement`` are int16 arrays of 256 entries
+    mapping ``type & 0xFF`` to a position in ``colors`` (-1: no colour
+    configured). ``colors[0]`` is "white", ``colors[1]`` is "black".
+    """
+
+    WHITE = 0
+    BLACK = 1
+
+    def __init__(self, surface_config):
+        self.surface_config = surface_config
+        config = surface_config or {}
+        index = {"white": self.WHITE, "black": self.BLACK}
+
+        self.water = self._lut(
+            config.get("water", {}).get("types", {}),
+            index,
+            default=index.setdefault(WATER_DEFAULT_COLOR, len(index)),
+        )
+
+        soil = np.full(256, index.setdefault(SOIL_DEFAULT_COLOR, len(index)), dtype=np.int16)
+        for soil_type, color in SOIL_FALLBACK_COLORS.items():
+            soil[soil_type] = index.setdefault(color, len(index))
+        configured = self._lut(config.get("soil", {}).get("types", {}), index)
+        self.soil = np.where(configured >= 0, configured, soil).astype(np.int16)
+
+        self.vegetation = self._lut(
+            config.get("vegetation", {}).get("types", {}), index, default=self.WHITE
+        )
+        self.pavement = self._lut(config.get("pavement", {}).get("types", {}), index)
+        self.colors = list(index)
+
+    @staticmethod
+    def _lut(types, index, default=-1):
+        """Build a 256-entry table: int8 type value -> colour position."""
+        lut = np.full(256, default, dtype=np.int16)
+        for type_id, type_def in types.items():
+            color = type_def.get("display", {}).get("color")
+            if color:
+                lut[int(type_id) & 0xFF] = index.setdefault(color, len(index))
+        return lut
+
+    def color(self, lut, value):
+        """Colour string of one type value, or None if none is configured."""
+        position = lut[int(value) & 0xFF]
+        return self.colors[position] if position >= 0 else None
+
+
+_tables = {}
+
+
+def color_tables(surface_config):
+    """Return the ColorTables of ``surface_config``, compiling them once.
+
+    Tables are cached per configuration object. Call clear_cache() after
+    changing a configuration dict in place.
+    """
+    tables = _tables.get(id(surface_config))
+    if tables is None or tables.surface_config is not surface_config:
+        tables = _tables[id(surface_config)] = ColorTables(surface_config)
+    return tables
+
+
+def clear_cache():
+    """Drop all compiled tables, e.g. after editing a surface configuration."""
+    _tables.clear()
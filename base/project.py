@@ -0,0 +1,143 @@
+"""
+Native PALMPaint project files.
+
+A project file stores every GridModel layer, water_pars, the origin and
+the view settings in one binary container:
+
+    magic (8 bytes)  b"PPAINT\\x00\\x01"
+    header length    uint64, little endian
+    data offset      uint64, little endian
+    header           UTF-8 JSON: grid size, resolution, origin, view
+                     settings and dtype/shape/offset of every array
+    arrays           raw C-order array data, each block page-aligned
+
+Because the arrays are stored raw and aligned, LoadProject() opens them
+with np.memmap instead of reading them: a project of several gigabytes
+opens instantly and only the regions that are viewed or edited are paged
+in. No Tkinter imports.
+
+    Copyright (C) 2025  Pierre Lampe
+    Licensed under the GNU General Public License v3 or later.
+"""
+
+import json
+import os
+import struct
+
+import numpy as np
+
+from base.gridmodel import GridModel
+
+
+MAGIC = b"PPAINT\x00\x01"
+FORMAT_VERSION = 1
+PROJECT_EXTENSION = ".ppaint"
+
+_PREFIX = struct.Struct("<8sQQ")
+_ALIGNMENT = 4096
+
+
+def _aligned(offset):
+    return -(-offset // _ALIGNMENT) * _ALIGNMENT
+
+
+def _write_array(file, array, band_cells=1 << 24):
+    """Write ``array`` in C order; non-numpy layers are written in row bands."""
+    if isinstance(array, np.ndarray):
+        array.tofile(file)
+        return
+    # TiledLayer: only one band of rows is ever dense in memory.
+    ny, nx = array.shape[-2:]
+    band = max(1, band_cells // max(nx, 1))
+    for lead in np.ndindex(*array.shape[:-2]):
+        for row in range(0, ny, band):
+            np.ascontiguousarray(array[lead + (slice(row, row + band), slice(None))]).tofile(file)
+
+
+def SaveProject(model, ori, filename, view=None, quiet=False):
+    """
+    Write the model, its origin and optional view settings (a JSON
+    serialisable dict) to a project file. ``quiet`` suppresses the
+    console message, e.g. for autosaves.
+
+    The file is written next to the target and moved into place at the
+    end, so a failed save never leaves a truncated project behind.
+    """
+    arrays = {name: getattr(model, name) for name in GridModel.LAYERS}
+    arrays["water_pars"] = model.water_pars
+
+    entries = {}
+    offset = 0
+    for name, array in arrays.items():
+        entries[name] = {
+            "dtype": np.dtype(array.dtype).str,
+            "shape": list(array.shape),
+            "offset": offset,
+        }
+        offset = _aligned(offset + array.nbytes)
+
+    header = json.dumps({
+        "version": FORMAT_VERSION,
+        "nx": int(model.nx),
+        "ny": int(model.ny),
+        "res": float(model.res),
+        "origin": [float(value) for value in ori],
+        "view": view or {},
+        "arrays": entries,
+    }).encode("utf-8")
+    data_offset = _aligned(_PREFIX.size + len(header))
+
+    tmp_filename = f"{filename}.tmp"
+    with open(tmp_filename, "wb") as file:
+        file.write(_PREFIX.pack(MAGIC, len(header), data_offset))
+        file.write(header)
+        for name, array in arrays.items():
+            file.seek(data_offset + entries[name]["offset"])
+            _write_array(file, array)
+        file.truncate(data_offset + offset)
+    os.replace(tmp_filename, filename)
+    if not quiet:
+        print(f"Project saved: {filename}")
+
+
+def read_project_header(filename):
+    """Return ``(header, data_offset)`` of a project file."""
+    with open(filename, "rb") as file:
+        prefix = file.read(_PREFIX.size)
+        if len(prefix) < _PREFIX.size:
+            raise ValueError(f"{filename} is not a PALMPaint project file")
+        magic, header_length, data_offset = _PREFIX.unpack(prefix)
+        if magic != MAGIC:
+            raise ValueError(f"{filename} is not a PALMPaint project file")
+        header = json.loads(file.read(header_length).decode("utf-8"))
+    if header.get("version", 0) > FORMAT_VERSION:
+        raise ValueError(
+            f"{filename} was written by a newer PALMPaint (format {header['version']})"
+        )
+    return header, data_offset
+
+
+def LoadProject(filename, surface_config=None, mode="c"):
+    """
+    Open a project file. Returns a tuple: (model, ori, view).
+
+    The layers are memory-mapped. With the default mode "c"
+    (copy-on-write) edits stay in memory and the file is left untouched
+    until it is saved again; "r+" writes edits straight through to the
+    file.
+    """
+    header, data_offset = read_project_header(filename)
+    layers = {
+        name: np.memmap(
+            filename,
+            dtype=np.dtype(entry["dtype"]),
+            mode=mode,
+            offset=data_offset + entry["offset"],
+            shape=tuple(entry["shape"]),
+        )
+        for name, entry in header["arrays"].items()
+    }
+    model = GridModel.from_arrays(
+        header["nx"], header["ny"], header["res"], surface_config, **layers
+    )
+    return model, tuple(header["origin"]), header.get("view", {})
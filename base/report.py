@@ -4,6 +4,8 @@ from tkinter import filedialog
 from tkinter import messagebox
 from datetime import datetime
 
+import base.stats as stats
+
 def format_value(value, width=10):
     """Ensures integers and floats are aligned correctly."""
     if isinstance(value, int):
@@ -13,24 +15,25 @@ def format_value(value, width=10):
     else:
         return str(value)  # Handle non-numeric values gracefully
 
-def generate_report(root, pixels, nx, ny, dxy, ori):
-    """Generate statistics and plot the domain."""
-    land_use_counts = {"vegetation": 0, "pavement": 0, "soil": 0, "water": 0, "building": 0}
-    total_pixels = len(pixels)
+def format_type_areas(type_counts, types, cell_area, width=10):
+    """Format a {type_id: cell_count} histogram as aligned text lines."""
+    lines = []
+    for type_id, count in type_counts.items():
+        label = types.get(type_id, {}).get("label", "unknown")
+        lines.append(
+            f"{type_id:>3} {label:<28} {format_value(count, width)} cells"
+            f" {format_value(count * cell_area, width)} m²"
+        )
+    return lines
 
-    for pixel in pixels.values():
-        if pixel["vegetation_type"] > 1:
-            land_use_counts["vegetation"] += 1
-        elif pixel["pavement_type"] > 0:
-            land_use_counts["pavement"] += 1
-        elif pixel["vegetation_type"] == 1:
-            land_use_counts["soil"] += 1
-        elif "water_type" in pixel and pixel["water_type"] > 0:
-            land_use_counts["water"] += 1
-        elif "building_id" in pixel and pixel["building_id"] > 0:
-            land_use_counts["building"] += 1
 
-    percentages = {key: (value / total_pixels) * 100 for key, value in land_use_counts.items()}
+def generate_report(root, model, ori):
+    """Generate statistics and plot the domain."""
+    nx, ny, dxy = model.nx, model.ny, model.res
+    statistics = stats.domain_statistics(model)
+    land_use_counts = statistics["land_use_counts"]
+    percentages = statistics["land_use_percentages"]
+    total_pixels = statistics["total_cells"]
     
     # Namelist Parameters
     namelist_info = f"nx: {nx-1}\n"
@@ -63,23 +66,32 @@ def generate_report(root, pixels, nx, ny, dxy, ori):
     building_info += f"==================\n"
     
     building_data = {}
-    if land_use_counts["building"] > 0:
-        # Calculate building statistics
-        max_height = float(max(pixel["building_height"] for pixel in pixels.values() if "building_height" in pixel))
-        min_height = min(pixel["building_height"] for pixel in pixels.values() if "building_height" in pixel and pixel["building_height"] != -127)
-        avg_height = sum(pixel["building_height"] for pixel in pixels.values() if "building_height" in pixel and pixel["building_height"] != -127) / land_use_counts["building"]
-        unique_building_ids = set(pixel["building_id"] for pixel in pixels.values() if "building_id" in pixel and pixel["building_height"] != -127)
-
-        # Store values in a dictionary
+    buildings = statistics["buildings"]
+    if land_use_counts["building"] > 0 and buildings is not None:
         building_data = {
-            "Maximum Building Height (m)": format_value(max_height),
-            "Minimum Building Height (m)": format_value(min_height),
-            "Average Building Height (m)": format_value(avg_height),
-            "Unique building IDs": format_value(len(unique_building_ids)),
+            "Maximum Building Height (m)": format_value(buildings["max_height"]),
+            "Minimum Building Height (m)": format_value(buildings["min_height"]),
+            "Average Building Height (m)": format_value(buildings["mean_height"]),
+            "Unique building IDs": format_value(buildings["unique_ids"]),
         }
     else:
         building_data["Buildings Detected"] = "No buildings detected"
 
+    # Per-type areas
+    surface_config = model.surface_config or {}
+    type_area_lines = []
+    for layer in ("vegetation", "pavement", "water", "soil"):
+        counts = statistics["type_counts"][layer]
+        if not counts:
+            continue
+        type_area_lines.append(f"{layer.capitalize()} types")
+        type_area_lines.extend(format_type_areas(
+            counts,
+            surface_config.get(layer, {}).get("types", {}),
+            statistics["cell_area"],
+        ))
+    type_area_text = "\n".join(type_area_lines)
+
     # Create a new window
     report_window = Toplevel(root)
     report_window.title("Domain Report")
@@ -109,6 +121,10 @@ def generate_report(root, pixels, nx, ny, dxy, ori):
     building_info_text = "\n".join([f"{key:<{longest_label}}  {value}" for key, value in building_data.items()])
     tk.Label(report_window, text=building_info_text, font=font_style, anchor="w", justify="left").pack(padx=10, pady=5, fill="x")
 
+    # Display per-type areas
+    tk.Label(report_window, text="Surface Type Areas", font=("Arial", 12), anchor="w").pack(padx=10, pady=5, fill="x")
+    tk.Label(report_window, text=type_area_text, font=font_style, anchor="w", justify="left").pack(padx=10, pady=5, fill="x")
+
     # Save report
     def save_report():
             """Save the statistics to a text file."""
@@ -136,6 +152,10 @@ def generate_report(root, pixels, nx, ny, dxy, ori):
                     file.write("Building Information\n")
                     file.write("===============\n")
                     file.write(building_info_text + "\n")
+                    file.write("\n")
+                    file.write("Surface Type Areas\n")
+                    file.write("===============\n")
+                    file.write(type_area_text + "\n")
                     file.write(f"\nBuildings detected (please switch on USM Namelist in PALM p3d)\n")
                     file.write("\n")
                     file.write(f"Report generated on {datetime.now().strftime('%d-%m-%Y %H:%M:%S')}\n")
@@ -0,0 +1,142 @@
+"""
+Copy-on-write snapshots of GridModel layers.
+
+A SnapshotLayer freezes the current contents of a live (..., ny, nx)
+numpy array, including a memory-mapped one, without copying it. Reads go
+to the live array; before the owning GridModel writes rows of the live
+array it calls preserve(), which copies the affected row bands into the
+snapshot first. Taking a snapshot is therefore instant and costs memory
+only for the bands edited while it is alive, e.g. during a background
+save.
+
+preserve() runs on the thread that edits the model, reads usually on a
+worker thread; both take a per-layer lock for one band at a time, so the
+editing thread waits at most for the copy of a single band.
+No Tkinter imports.
+
+    Copyright (C) 2025  Pierre Lampe
+    Licensed under the GNU General Public License v3 or later.
+"""
+
+import threading
+
+import numpy as np
+
+
+class SnapshotLayer(np.lib.mixins.NDArrayOperatorsMixin):
+    """Frozen, lazily copied view of a live array.
+
+    Indexing with integers and slices reads band by band; any other
+    index and all ufuncs and operators work on a dense copy, like
+    TiledLayer.
+
+    Parameters
+    ----------
+    source : numpy.ndarray
+        The live array; it must only be written after preserve() has
+        been called for the rows concerned.
+    band_bytes : int
+        Approximate size of the row bands copied by preserve().
+    """
+
+    # Operators compare element-wise; hash by identity so the owning
+    # model can track its snapshots in a WeakSet.
+    __hash__ = object.__hash__
+
+    def __init__(self, source, band_bytes=1 << 18):
+        self._source = source
+        self.shape = source.shape
+        self.dtype = source.dtype
+        row_bytes = max(1, source.nbytes // max(1, source.shape[-2]))
+        self.band_rows = max(1, band_bytes // row_bytes)
+        self._bands = {}  # band index -> saved rows of that band
+        self._lock = threading.Lock()
+
+    @property
+    def ndim(self):
+        return len(self.shape)
+
+    @property
+    def size(self):
+        return int(np.prod(self.shape))
+
+    @property
+    def nbytes(self):
+        """Size of the equivalent dense array."""
+        return self.size * self.dtype.itemsize
+
+    @property
+    def saved_nbytes(self):
+        """Bytes of the bands copied so far."""
+        return sum(band.nbytes for band in self._bands.values())
+
+    def __len__(self):
+        return self.shape[0]
+
+    def preserve(self, rows):
+        """Copy the bands holding ``rows`` (a slice or row indices) before
+        the live array changes them."""
+        band_rows = self.band_rows
+        if isinstance(rows, slice):
+            start, stop, _ = rows.indices(self.shape[-2])
+            bands = range(start // band_rows, -(-stop // band_rows))
+        else:
+            bands = np.unique(np.asarray(rows) // band_rows).tolist()
+        rows = band_rows
+        for band in bands:
+            with self._lock:
+                if band not in self._bands:
+                    self._bands[band] = np.array(
+                        self._source[..., band * rows:(band + 1) * rows, :]
+                    )
+
+    def _read(self, lead, start, stop):
+        """Rows [start, stop) of the snapshot with leading index ``lead``."""
+        rows = self.band_rows
+        pieces = []
+        for band in range(start // rows, -(-stop // rows)):
+            b0 = band * rows
+            r0, r1 = max(start, b0), min(stop, b0 + rows)
+            with self._lock:
+                saved = self._bands.get(band)
+                if saved is not None:
+                    pieces.append(saved[lead + (Ellipsis, slice(r0 - b0, r1 - b0), slice(None))])
+                else:
+                    pieces.append(np.array(self._source[lead + (Ellipsis, slice(r0, r1), slice(None))]))
+        if not pieces:
+            return np.array(self._source[lead + (Ellipsis, slice(start, start), slice(None))])
+        return np.concatenate(pieces, axis=-2)
+
+    def __array__(self, dtype=None, copy=None):
+        dense = self._read((), 0, self.shape[-2])
+        return dense if dtype is None else dense.astype(dtype, copy=False)
+
+    def __array_ufunc__(self, ufunc, method, *inputs, **kwargs):
+        if any(isinstance(out, SnapshotLayer) for out in kwargs.get("out", ())):
+            return NotImplemented
+        inputs = [np.asarray(x) if isinstance(x, SnapshotLayer) else x for x in inputs]
+        return getattr(ufunc, method)(*inputs, **kwargs)
+
+    def astype(self, dtype):
+        return np.asarray(self).astype(dtype)
+
+    def __getitem__(self, index):
+        index = index if isinstance(index, tuple) else (index,)
+        basic = len(index) <= self.ndim and all(
+            isinstance(i, (int, np.integer, slice)) for i in index
+        )
+        if not basic:
+            return np.asarray(self)[index]
+        index += (slice(None),) * (self.ndim - len(index))
+        lead, rows, cols = index[:-2], index[-2], index[-1]
+        ny = self.shape[-2]
+        if isinstance(rows, slice):
+            start, stop, step = rows.indices(ny)
+            if step < 0:
+                return np.asarray(self)[index]
+            block = self._read(lead, start, max(start, stop))
+            return block[..., ::step, cols]
+        row = int(rows) + ny if rows < 0 else int(rows)
+        if not 0 <= row < ny:
+            raise IndexError(f"row {rows} is out of bounds for {ny} rows")
+        return self._read(lead, row, row + 1)[..., 0, cols]
@@ -0,0 +1,93 @@
+"""
+Domain statistics for PALMPaint, computed from GridModel arrays.
+
+All figures are derived with NumPy reductions over whole layers, so the
+cost does not depend on Python-level loops over the cells. No Tkinter
+imports — usable from scripts and the batch tools.
+
+    Copyright (C) 2025  Pierre Lampe
+    Licensed under the GNU General Public License v3 or later.
+"""
+
+import numpy as np
+
+
+LAND_USE_CLASSES = ("vegetation", "pavement", "soil", "water", "building")
+
+
+def land_use_masks(model):
+    """Classify each cell into one land-use class.
+
+    First match wins, in this order: vegetation (type > 1), pavement,
+    bare soil (vegetation type 1), water, building.
+    Returns a dict of boolean (ny, nx) masks keyed by LAND_USE_CLASSES.
+    """
+    remaining = np.ones((model.ny, model.nx), dtype=bool)
+    masks = {}
+    for name, condition in (
+        ("vegetation", model.vegetation_type > 1),
+        ("pavement", model.pavement_type > 0),
+        ("soil", model.vegetation_type == 1),
+        ("water", model.water_type > 0),
+        ("building", model.building_id > 0),
+    ):
+        masks[name] = condition & remaining
+        remaining &= ~condition
+    return masks
+
+
+def type_counts(layer, mask=None):
+    """Return ``{type_id: cell_count}`` for all valid (> 0) types of a layer."""
+    valid = layer > 0
+    if mask is not None:
+        valid &= mask
+    counts = np.bincount(layer[valid].astype(np.intp), minlength=1)
+    type_ids = np.flatnonzero(counts)
+    return {int(type_id): int(counts[type_id]) for type_id in type_ids}
+
+
+def building_statistics(model, mask):
+    """Height and ID figures for the cells in ``mask``, or None if empty."""
+    heights = model.building_height[mask]
+    heights = heights[heights >= 0.0]
+    if heights.size == 0:
+        return None
+    return {
+        "max_height": float(heights.max()),
+        "min_height": float(heights.min()),
+        "mean_height": float(heights.mean()),
+        "unique_ids": int(np.unique(model.building_id[mask]).size),
+    }
+
+
+def domain_statistics(model):
+    """Collect the figures shown in the domain report.
+
+    Returns a dict with:
+      - total_cells, cell_area (m²)
+      - land_use_counts / land_use_percentages keyed by LAND_USE_CLASSES
+      - buildings: building_statistics() of the building cells or None
+      - type_counts: per-layer ``{type_id: cell_count}`` histograms for
+        vegetation, pavement, water and soil
+    """
+    total_cells = model.nx * model.ny
+    masks = land_use_masks(model)
+    counts = {name: int(np.count_nonzero(mask)) for name, mask in masks.items()}
+    percentages = {
+        name: (count / total_cells) * 100 if total_cells else 0.0
+        for name, count in counts.items()
+    }
+
+    return {
+        "total_cells": total_cells,
+        "cell_area": float(model.res) ** 2,
+        "land_use_counts": counts,
+        "land_use_percentages": percentages,
+        "buildings": building_statistics(model, masks["building"]),
+        "type_counts": {
+            "vegetation": type_counts(model.vegetation_type),
+            "pavement": type_counts(model.pavement_type),
+            "water": type_counts(model.water_type),
+            "soil": type_counts(model.soil_type),
+        },
+    }
@@ -0,0 +1,461 @@
+"""
+Tiled layer storage for GridModels larger than memory.
+
+A TiledLayer behaves like a (..., ny, nx) numpy array but stores the grid
+in fixed-size square tiles over the last two axes. Tiles are allocated
+only when a cell in them gets a value other than the fill value and are
+released again once they hold only the fill value; missing tiles read as
+the fill value, so mostly-fill layers are stored sparsely. At most
+``max_tiles`` tiles are held in memory, the least recently used ones are
+written to a temporary memory-mapped backing file and read back on
+demand.
+
+snapshot() returns a frozen copy-on-write view of a layer: it reads the
+tiles of the live layer, and a tile is copied into the snapshot only
+before it is first written. The layer and its snapshots share a lock
+taken for one tile at a time, so a snapshot can be read on another
+thread while the layer is edited.
+
+Indexing with integers and slices, and pointwise indexing with integer
+arrays for rows and columns (``layer[rows, cols]``), is done tile by tile.
+Any other index (e.g. boolean masks) and all ufuncs and operators work on
+a dense copy, so code written for numpy layers keeps working unchanged.
+No Tkinter imports.
+
+    Copyright (C) 2025  Pierre Lampe
+    Licensed under the GNU General Public License v3 or later.
+"""
+
+import os
+import tempfile
+import threading
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+
+
+class TiledLayer(np.lib.mixins.NDArrayOperatorsMixin):
+    """Lazily allocated, disk-backed tiled array.
+
+    Parameters
+    ----------
+    shape : tuple
+        Full array shape; the last two axes (ny, nx) are tiled.
+    dtype : numpy dtype
+    fill_value : scalar
+        Value of cells in tiles that were never written.
+    tile_size : int
+        Edge length of the square tiles in cells.
+    max_tiles : int or None
+        Number of tiles kept in memory before the least recently used
+        ones are moved to the backing file; None keeps all in memory.
+    backing_dir : str, optional
+        Directory of the backing file (default: system temp directory).
+    """
+
+    # Operators compare element-wise; hash by identity so a layer can
+    # track its snapshots in a WeakSet.
+    __hash__ = object.__hash__
+
+    def __init__(self, shape, dtype, fill_value, tile_size=512, max_tiles=256, backing_dir=None):
+        self.shape = tuple(int(n) for n in shape)
+        self.dtype = np.dtype(dtype)
+        self.fill_value = self.dtype.type(fill_value)
+        self.tile_size = int(tile_size)
+        self.max_tiles = None if max_tiles is None else max(1, int(max_tiles))
+        self.backing_dir = backing_dir
+
+        self._lead = self.shape[:-2]
+        ny, nx = self.shape[-2:]
+        self._n_tiles = (-(-ny // self.tile_size), -(-nx // self.tile_size))
+        self._tiles = OrderedDict()
+        self._on_disk = set()
+        self._backing = None
+        self._backing_path = None
+        self._lock = threading.RLock()
+        self._snapshots = weakref.WeakSet()
+        self._source = None  # live layer of a snapshot
+        self._kept = set()   # tiles a snapshot has copied from its source
+
+    @classmethod
+    def from_array(cls, array, fill_value, **kwargs):
+        """Build a TiledLayer holding only the non-fill tiles of ``array``."""
+        array = np.asarray(array)
+        layer = cls(array.shape, array.dtype, fill_value, **kwargs)
+        ts = layer.tile_size
+        everything = (slice(None),) * len(layer._lead)
+        for tr in range(layer._n_tiles[0]):
+            for tc in range(layer._n_tiles[1]):
+                block = (slice(tr * ts, (tr + 1) * ts), slice(tc * ts, (tc + 1) * ts))
+                layer[everything + block] = array[(Ellipsis,) + block]
+        return layer
+
+    # ------------------------------------------------------------------
+    # Array-like attributes
+    # ------------------------------------------------------------------
+
+    @property
+    def ndim(self):
+        return len(self.shape)
+
+    @property
+    def size(self):
+        return int(np.prod(self.shape))
+
+    @property
+    def nbytes(self):
+        """Size of the equivalent dense array."""
+        return self.size * self.dtype.itemsize
+
+    @property
+    def resident_nbytes(self):
+        """Bytes of the tiles currently held in memory."""
+        return sum(tile.nbytes for tile in self._tiles.values())
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __repr__(self):
+        return (
+            f"TiledLayer(shape={self.shape}, dtype={self.dtype}, "
+            f"tiles={len(self._tiles)} in memory / {len(self._on_disk)} on disk)"
+        )
+
+    def __array__(self, dtype=None, copy=None):
+        dense = np.full(self.shape, self.fill_value, dtype=self.dtype)
+        ts = self.tile_size
+        with self._lock:
+            keys = self._keys()
+        for tr, tc in keys:
+            with self._lock:
+                tile = self._stored((tr, tc))
+                if tile is not None:
+                    block = dense[..., tr * ts:(tr + 1) * ts, tc * ts:(tc + 1) * ts]
+                    block[...] = tile[..., :block.shape[-2], :block.shape[-1]]
+        return dense if dtype is None else dense.astype(dtype, copy=False)
+
+    def __array_ufunc__(self, ufunc, method, *inputs, **kwargs):
+        if any(isinstance(out, TiledLayer) for out in kwargs.get("out", ())):
+            return NotImplemented
+        inputs = [np.asarray(x) if isinstance(x, TiledLayer) else x for x in inputs]
+        return getattr(ufunc, method)(*inputs, **kwargs)
+
+    def astype(self, dtype):
+        return np.asarray(self).astype(dtype)
+
+    def copy(self):
+        return np.asarray(self)
+
+    def snapshot(self):
+        """Frozen copy-on-write TiledLayer with the same contents and tiling.
+
+        Nothing is copied up front: the snapshot reads the tiles of this
+        layer, and a tile is copied into the snapshot (and its own
+        backing file) only before this layer first writes it.
+        """
+        copy = TiledLayer(
+            self.shape, self.dtype, self.fill_value,
+            self.tile_size, self.max_tiles, self.backing_dir,
+        )
+        copy._lock = self._lock
+        copy._source = self
+        with self._lock:
+            self._snapshots.add(copy)
+        return copy
+
+    # ------------------------------------------------------------------
+    # Tile management
+    # ------------------------------------------------------------------
+
+    def _tile(self, key, create):
+        """Return the tile ``key``, loading or allocating it as needed.
+
+        A snapshot returns a copy of a tile it still shares with its
+        source; writes keep the tile first (see _keep), so ``create`` is
+        never set for such a tile.
+        """
+        with self._lock:
+            tile = self._tiles.get(key)
+            if tile is not None:
+                self._tiles.move_to_end(key)
+                return tile
+            ts = self.tile_size
+            if key in self._on_disk:
+                r0, c0 = key[0] * ts, key[1] * ts
+                tile = np.array(self._backing[..., r0:r0 + ts, c0:c0 + ts])
+            elif self._source is not None and key not in self._kept:
+                tile = self._source._stored(key)
+                return None if tile is None else np.array(tile)
+            elif create:
+                tile = np.full(self._lead + (ts, ts), self.fill_value, dtype=self.dtype)
+            else:
+                return None
+            self._tiles[key] = tile
+            self._evict()
+            return tile
+
+    def _stored(self, key):
+        """The stored tile ``key`` without loading it, or None if it only
+        holds the fill value. Not a copy: call with the lock held."""
+        tile = self._tiles.get(key)
+        if tile is not None:
+            return tile
+        if key in self._on_disk:
+            r0, c0 = key[0] * self.tile_size, key[1] * self.tile_size
+            return self._backing[..., r0:r0 + self.tile_size, c0:c0 + self.tile_size]
+        if self._source is not None and key not in self._kept:
+            return self._source._stored(key)
+        return None
+
+    def _keys(self):
+        """Keys of all tiles that may hold values other than the fill value."""
+        keys = set(self._tiles) | self._on_disk
+        if self._source is not None:
+            keys |= self._source._keys() - self._kept
+        return keys
+
+    def _keep(self, key):
+        """Copy tile ``key`` from the source of this snapshot before the
+        source (or the snapshot itself) writes it."""
+        if self._source is None or key in self._kept:
+            return
+        tile = self._source._stored(key)
+        self._kept.add(key)
+        if tile is not None:
+            self._tiles[key] = np.array(tile)
+            self._evict()
+
+    def _evict(self):
+        """Move least recently used tiles to the backing file."""
+        ts = self.tile_size
+        while self.max_tiles is not None and len(self._tiles) > self.max_tiles:
+            key, tile = self._tiles.popitem(last=False)
+            if self._backing is None:
+                self._open_backing()
+            r0, c0 = key[0] * ts, key[1] * ts
+            self._backing[..., r0:r0 + ts, c0:c0 + ts] = tile
+            self._on_disk.add(key)
+
+    def _open_backing(self):
+        fd, self._backing_path = tempfile.mkstemp(
+            prefix="palmpaint_tiles_", suffix=".dat", dir=self.backing_dir
+        )
+        os.close(fd)
+        padded = self._lead + (self._n_tiles[0] * self.tile_size, self._n_tiles[1] * self.tile_size)
+        self._backing = np.memmap(self._backing_path, dtype=self.dtype, mode="w+", shape=padded)
+
+    def close(self):
+        """Drop the backing file. The layer must not be used afterwards."""
+        self._tiles.clear()
+        self._on_disk.clear()
+        if self._backing is not None:
+            self._backing = None
+            os.remove(self._backing_path)
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+    # ------------------------------------------------------------------
+    # Indexing
+    # ------------------------------------------------------------------
+
+    def _axis_groups(self, index):
+        """Group the 1-D indices of one axis by tile.
+
+        Returns ``[(tile, positions, local), ...]`` where ``positions``
+        index ``index`` and ``local`` the tile; both are slices when the
+        group is a contiguous ascending run, as for step-1 slices.
+        """
+        tiles = index // self.tile_size
+        order = np.argsort(tiles, kind="stable")
+        bounds = np.flatnonzero(np.diff(tiles[order])) + 1
+        groups = []
+        for group in np.split(order, bounds):
+            if group.size == 0:
+                continue
+            t = int(tiles[group[0]])
+            local = index[group] - t * self.tile_size
+            if group[-1] - group[0] + 1 == group.size and local[-1] - local[0] + 1 == group.size:
+                groups.append((t, slice(group[0], group[-1] + 1), slice(local[0], local[-1] + 1)))
+            else:
+                groups.append((t, group, local))
+        return groups
+
+    @staticmethod
+    def _outer(row_index, col_index):
+        """Index pair for a (rows x cols) block from slices or arrays."""
+        if isinstance(row_index, slice) and isinstance(col_index, slice):
+            return row_index, col_index
+        if isinstance(row_index, slice):
+            row_index = np.arange(row_index.start, row_index.stop)
+        if isinstance(col_index, slice):
+            col_index = np.arange(col_index.start, col_index.stop)
+        return row_index[:, None], col_index[None, :]
+
+    @staticmethod
+    def _axis_index(k, n):
+        """1-D index array of an int, slice or int array over an axis of length ``n``."""
+        if isinstance(k, slice):
+            return np.arange(*k.indices(n))
+        if isinstance(k, np.ndarray):
+            if k.size and not (-n <= k.min() and k.max() < n):
+                raise IndexError(f"index out of bounds for axis with size {n}")
+            return k % n
+        k = int(k)
+        if not -n <= k < n:
+            raise IndexError(f"index {k} is out of bounds for axis with size {n}")
+        return np.array([k % n])
+
+    def _pointwise_groups(self, row, col):
+        """Group pointwise (row, col) index arrays by tile."""
+        ny, nx = self.shape[-2:]
+        row, col = np.broadcast_arrays(np.asarray(row), np.asarray(col))
+        shape = row.shape
+        row, col = row.ravel() % ny, col.ravel() % nx
+        keys = (row // self.tile_size) * self._n_tiles[1] + col // self.tile_size
+        order = np.argsort(keys, kind="stable")
+        bounds = np.flatnonzero(np.diff(keys[order])) + 1
+        groups = []
+        for group in np.split(order, bounds):
+            if group.size:
+                tr, tc = divmod(int(keys[group[0]]), self._n_tiles[1])
+                groups.append((
+                    (tr, tc), group,
+                    row[group] - tr * self.tile_size,
+                    col[group] - tc * self.tile_size,
+                ))
+        return shape, groups
+
+    def _index_kind(self, key):
+        """Classify an index.
+
+        Returns ``(kind, lead, row, col)``: kind is "block" for ints and
+        slices on the grid axes and for np.ix_-style (n, 1) x (1, m)
+        integer arrays (returned as 1-D arrays), "points" for other
+        integer arrays on both, or None for anything handled on a dense
+        copy.
+        """
+        if not isinstance(key, tuple):
+            key = (key,)
+        if len(key) > self.ndim or any(k is Ellipsis or k is None for k in key):
+            return None, None, None, None
+        key = key + (slice(None),) * (self.ndim - len(key))
+        lead, row, col = key[:-2], key[-2], key[-1]
+        if not all(isinstance(k, (slice, int, np.integer)) for k in lead):
+            return None, None, None, None
+        basic = (slice, int, np.integer)
+        if isinstance(row, basic) and isinstance(col, basic):
+            return "block", lead, row, col
+        if isinstance(row, basic) or isinstance(col, basic):
+            return None, None, None, None
+        row, col = np.asarray(row), np.asarray(col)
+        if row.dtype.kind in "iu" and col.dtype.kind in "iu":
+            if row.ndim == col.ndim == 2 and row.shape[1] == 1 and col.shape[0] == 1:
+                return "block", lead, row[:, 0], col[0]
+            return "points", lead, row, col
+        return None, None, None, None
+
+    def __getitem__(self, key):
+        kind, lead, row, col = self._index_kind(key)
+        if kind is None:
+            return np.asarray(self)[key]
+        lead_shape = np.empty(self._lead, dtype=bool)[lead].shape
+
+        if kind == "points":
+            shape, groups = self._pointwise_groups(row, col)
+            out = np.full(lead_shape + (int(np.prod(shape)),), self.fill_value, dtype=self.dtype)
+            for tile_key, positions, local_r, local_c in groups:
+                tile = self._tile(tile_key, create=False)
+                if tile is not None:
+                    out[..., positions] = tile[lead][..., local_r, local_c]
+            return out.reshape(lead_shape + shape)
+
+        ny, nx = self.shape[-2:]
+        rows, cols = self._axis_index(row, ny), self._axis_index(col, nx)
+        out = np.full(lead_shape + (rows.size, cols.size), self.fill_value, dtype=self.dtype)
+        col_groups = self._axis_groups(cols)
+        for tr, out_r, local_r in self._axis_groups(rows):
+            for tc, out_c, local_c in col_groups:
+                tile = self._tile((tr, tc), create=False)
+                if tile is not None:
+                    out[(Ellipsis,) + self._outer(out_r, out_c)] = (
+                        tile[lead][(Ellipsis,) + self._outer(local_r, local_c)]
+                    )
+        out = out[
+            Ellipsis,
+            0 if isinstance(row, (int, np.integer)) else slice(None),
+            0 if isinstance(col, (int, np.integer)) else slice(None),
+        ]
+        return out[()] if out.ndim == 0 else out
+
+    def __setitem__(self, key, value):
+        kind, lead, row, col = self._index_kind(key)
+        value = np.asarray(value).astype(self.dtype, copy=False)
+        if kind is None:
+            self._set_dense(key, value)
+            return
+        lead_shape = np.empty(self._lead, dtype=bool)[lead].shape
+
+        if kind == "points":
+            shape, groups = self._pointwise_groups(row, col)
+            value = np.broadcast_to(value, lead_shape + shape).reshape(lead_shape + (-1,))
+            for tile_key, positions, local_r, local_c in groups:
+                self._write_tile(tile_key, lead, (Ellipsis, local_r, local_c), value[..., positions])
+            return
+
+        ny, nx = self.shape[-2:]
+        rows, cols = self._axis_index(row, ny), self._axis_index(col, nx)
+        squeezed = lead_shape + tuple(
+            index.size for k, index in ((row, rows), (col, cols))
+            if not isinstance(k, (int, np.integer))
+        )
+        value = np.broadcast_to(value, squeezed).reshape(lead_shape + (rows.size, cols.size))
+        col_groups = self._axis_groups(cols)
+        for tr, out_r, local_r in self._axis_groups(rows):
+            for tc, out_c, local_c in col_groups:
+                self._write_tile(
+                    (tr, tc), lead,
+                    (Ellipsis,) + self._outer(local_r, local_c),
+                    value[(Ellipsis,) + self._outer(out_r, out_c)],
+                )
+
+    def _write_tile(self, key, lead, index, part):
+        """Write ``part`` to ``tile[lead][index]``.
+
+        Writing only the fill value never allocates a tile, and a tile that
+        holds nothing but the fill value afterwards is released, so layers
+        that are mostly fill (like water_pars) stay sparse.
+        """
+        only_fill = not (part != self.fill_value).any()
+        with self._lock:
+            self._keep(key)
+            for snapshot in list(self._snapshots):
+                snapshot._keep(key)
+            tile = self._tile(key, create=not only_fill)
+            if tile is None:
+                return
+            tile[lead][index] = part
+            if only_fill and not (tile != self.fill_value).any():
+                self._release(key)
+
+    def _release(self, key):
+        self._tiles.pop(key, None)
+        self._on_disk.discard(key)
+
+    def _set_dense(self, key, value):
+        """Assign with any other index on a dense copy, then store changed tiles."""
+        dense = np.asarray(self)
+        before = dense.copy()
+        dense[key] = value
+        changed = (dense != before).reshape((-1,) + self.shape[-2:]).any(axis=0)
+        ts = self.tile_size
+        everything = (slice(None),) * len(self._lead)
+        for tr in range(self._n_tiles[0]):
+            for tc in range(self._n_tiles[1]):
+                block = (slice(tr * ts, (tr + 1) * ts), slice(tc * ts, (tc + 1) * ts))
+                if changed[block].any():
+                    self[everything + block] = dense[(Ellipsis,) + block]
@@ -11,6 +11,8 @@ modifies it — all data changes go through the GridModel.
 
 import tkinter as tk
 
+import numpy as np
+
 
 class TkCanvasBackend:
     """Renders a GridModel onto a Tkinter Canvas.
@@ -28,14 +30,21 @@ class TkCanvasBackend:
         Initial display resolution (pixels per grid cell).
     """
 
+    # Canvas tag of the grid line overlay.
+    GRID_LINE_TAG = "gridlines"
+    # Minimum cell size in screen pixels before grid lines are shown.
+    GRID_LINE_MIN_RES = 4
+
     def __init__(self, root, model, nx, ny, res):
         self.model  = model
-        self.pixels = {}   # {(row, col): {"id": canvas_id, "outline": colour}}
+        self.pixels = {}   # {(row, col): {"id": canvas_id}}
+        self.nx, self.ny, self.res = nx, ny, res
         self.show_grid_lines = True
         self.view_mode = "landcover"
         self.height_view_min = 0.0
         self.height_view_step = 1.0
         self.height_view_levels = 10
+        self._reset_grid_lines()
         self._setup_canvas(root, nx, ny, res)
 
     # ------------------------------------------------------------------
@@ -56,14 +65,14 @@ class TkCanvasBackend:
         self.canvas.pack(side=tk.RIGHT, expand=tk.YES, fill=tk.BOTH)
 
     def _create_scroll_bars(self):
-        x_scroll = tk.Scrollbar(self.canvas_frame, orient="horizontal")
-        x_scroll.pack(side="bottom", fill="x")
-        x_scroll.config(command=self.canvas.xview)
-        y_scroll = tk.Scrollbar(self.canvas_frame, orient="vertical")
-        y_scroll.pack(side="right", fill="y")
-        y_scroll.config(command=self.canvas.yview)
+        self.x_scroll = tk.Scrollbar(self.canvas_frame, orient="horizontal")
+        self.x_scroll.pack(side="bottom", fill="x")
+        self.x_scroll.config(command=self.canvas.xview)
+        self.y_scroll = tk.Scrollbar(self.canvas_frame, orient="vertical")
+        self.y_scroll.pack(side="right", fill="y")
+        self.y_scroll.config(command=self.canvas.yview)
         self.canvas.config(
-            xscrollcommand=x_scroll.set, yscrollcommand=y_scroll.set
+            xscrollcommand=self.x_scroll.set, yscrollcommand=self.y_scroll.set
         )
 
     # ------------------------------------------------------------------
@@ -77,60 +86,135 @@ class TkCanvasBackend:
         Existing canvas objects are NOT deleted here — call clear() first
         if you need to wipe the canvas.
         """
+        self.nx, self.ny, self.res = nx, ny, res
         self.pixels = {}
-        outline_color = "white" if self.show_grid_lines else ""
         for row in range(ny):
             for col in range(nx):
                 x1, y1 = col * res, (ny - 1 - row) * res
                 x2, y2 = x1 + res, y1 + res
                 rect = self.canvas.create_rectangle(
-                    x1, y1, x2, y2, fill="brown", outline=outline_color
+                    x1, y1, x2, y2, fill="brown", outline=""
                 )
-                self.pixels[(row, col)] = {"id": rect, "outline": outline_color}
-                
+                self.pixels[(row, col)] = {"id": rect}
+        self.draw_grid_lines()
+
+    # ------------------------------------------------------------------
+    # Grid line overlay
+    # ------------------------------------------------------------------
+
+    def _grid_line_positions(self):
+        """Screen positions of the grid lines and the extent they span.
+
+        Returns ``(xs, ys, (x1, y1, x2, y2))``: one vertical line per x,
+        one horizontal line per y.
+        """
+        width, height = self.nx * self.res, self.ny * self.res
+        xs = np.arange(self.nx + 1) * self.res
+        ys = np.arange(self.ny + 1) * self.res
+        return xs, ys, (0, 0, width, height)
+
+    def _grid_line_state(self):
+        """Canvas state of the overlay: hidden when off or cells are too small."""
+        if self.show_grid_lines and self.res >= self.GRID_LINE_MIN_RES:
+            return "normal"
+        return "hidden"
+
+    def _reset_grid_lines(self):
+        # Canvas ids of the vertical and horizontal grid lines and the
+        # positions they were last placed at.
+        self._grid_lines = ([], [])
+        self._grid_line_key = None
+
+    def draw_grid_lines(self):
+        """Place the grid line overlay above the cells.
+
+        Existing lines are moved with coords(); lines are only created or
+        deleted when their number changes, and nothing is done while the
+        positions stay the same.
+        """
+        xs, ys, extent = self._grid_line_positions()
+        state = self._grid_line_state()
+        key = (xs.tobytes(), ys.tobytes(), tuple(extent), state)
+        if key == self._grid_line_key:
+            return
+        self._grid_line_key = key
+        x1, y1, x2, y2 = extent
+        vertical, horizontal = self._grid_lines
+        self._place_lines(vertical, [(x, y1, x, y2) for x in xs.tolist()])
+        self._place_lines(horizontal, [(x1, y, x2, y) for y in ys.tolist()])
+        # one tag operation sets the state of moved and new lines alike
+        self.canvas.itemconfigure(self.GRID_LINE_TAG, state=state)
+        self.canvas.tag_raise(self.GRID_LINE_TAG)
+
+    def _place_lines(self, ids, lines):
+        """Move the line items ``ids`` to ``lines``, creating or deleting the difference."""
+        for item, line in zip(ids, lines):
+            self.canvas.coords(item, *line)
+        for line in lines[len(ids):]:
+            ids.append(self.canvas.create_line(
+                *line, fill="white", tags=self.GRID_LINE_TAG
+            ))
+        if len(ids) > len(lines):
+            self.canvas.delete(*ids[len(lines):])
+            del ids[len(lines):]
+
     def set_grid_lines_visible(self, visible):
-        """Show or hide grid cell outlines."""
+        """Show or hide the grid lines with one tag operation."""
         self.show_grid_lines = bool(visible)
-        outline_color = "white" if visible else ""
-
-        for pixel in self.pixels.values():
-            self.canvas.itemconfig(pixel["id"], outline=outline_color)
-            pixel["outline"] = outline_color
+        self.canvas.itemconfigure(self.GRID_LINE_TAG, state=self._grid_line_state())
             
-    def update_grid(self, nx, ny, res):
-        """Redraw all canvas rectangles from the current model state."""
-        outline_color = "white" if self.show_grid_lines else ""
+    def _color_kwargs(self):
+        """Colour lookup arguments for the active view mode."""
         z_min = z_max = None
         if self.view_mode == "heightmap":
             z_min = self.height_view_min
             z_max = self.height_view_min + self.height_view_step * self.height_view_levels
+        return dict(
+            view_mode=self.view_mode,
+            z_min=z_min,
+            z_max=z_max,
+            z_step=self.height_view_step,
+            levels=self.height_view_levels,
+        )
+
+    def update_grid(self, nx, ny, res):
+        """Redraw all canvas rectangles from the current model state."""
+        self.nx, self.ny, self.res = nx, ny, res
+        self.model.pop_dirty()
+        indices, palette = self.model.compute_color_indices(**self._color_kwargs())
+        indices = indices.tolist()
 
         for row in range(ny):
             for col in range(nx):
                 x1, y1 = col * res, (ny - 1 - row) * res
                 x2, y2 = x1 + res, y1 + res
-                color = self.model.get_color(
-                    row,
-                    col,
-                    view_mode=self.view_mode,
-                    z_min=z_min,
-                    z_max=z_max,
-                    z_step=self.height_view_step,
-                    levels=self.height_view_levels,
-                )
+                color = palette[indices[row][col]]
                 pixel_info = self.pixels.get((row, col))
 
                 if pixel_info is None:
                     rect = self.canvas.create_rectangle(
-                        x1, y1, x2, y2, fill=color, outline=outline_color
+                        x1, y1, x2, y2, fill=color, outline=""
                     )
-                    self.pixels[(row, col)] = {"id": rect, "outline": outline_color}
+                    self.pixels[(row, col)] = {"id": rect}
                 else:
                     self.canvas.coords(pixel_info["id"], x1, y1, x2, y2)
-                    self.canvas.itemconfig(
-                        pixel_info["id"], fill=color, outline=outline_color
-                    )
-                    pixel_info["outline"] = outline_color
+                    self.canvas.itemconfig(pixel_info["id"], fill=color)
+        self.draw_grid_lines()
+
+    def flush_dirty(self):
+        """Repaint only the cells written since the last flush, in one batch."""
+        region = self.model.pop_dirty()
+        if region is None:
+            return
+        rows, cols = region
+        indices, palette = self.model.compute_color_indices(
+            rows=rows, cols=cols, **self._color_kwargs()
+        )
+        for i, row in enumerate(range(rows.start, rows.stop)):
+            for j, col in enumerate(range(cols.start, cols.stop)):
+                self.canvas.itemconfig(
+                    self.pixels[(row, col)]["id"], fill=palette[indices[i, j]]
+                )
 
     def update_pixel(self, row, col):
         """Refresh the fill colour of a single canvas rectangle."""
@@ -162,8 +246,10 @@ class TkCanvasBackend:
 
     def zoom(self, factor):
         """Scale all canvas objects and update the scroll region."""
+        self.res *= factor
         self.canvas.scale("all", 0, 0, factor, factor)
         self.canvas.config(scrollregion=self.canvas.bbox(tk.ALL))
+        self.draw_grid_lines()
 
     # ------------------------------------------------------------------
     # Utility
@@ -173,3 +259,4 @@ class TkCanvasBackend:
         """Delete all canvas objects and reset the pixel registry."""
         self.canvas.delete("all")
         self.pixels = {}
+        self._reset_grid_lines()
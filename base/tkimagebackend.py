@@ -0,0 +1,322 @@
+"""
+Tkinter image rendering backend for PALMPaint.
+
+Draws the domain as a single tk.PhotoImage built from an RGB byte
+buffer instead of one canvas rectangle per cell. Only the visible part
+of the canvas plus a margin is rendered; scrolling past the margin or
+zooming renders a new image of the same size, so both cost about the
+same for any domain size. Offers the same interface as TkCanvasBackend,
+so it can be swapped in for large grids.
+
+    Copyright (C) 2025  Pierre Lampe
+    Licensed under the GNU General Public License v3 or later.
+"""
+
+import tkinter as tk
+
+import numpy as np
+
+from base.tkbackend import TkCanvasBackend
+
+
+class _CellRegistry:
+    """Read-only stand-in for TkCanvasBackend.pixels.
+
+    Supports membership tests and iteration over (row, col) keys without
+    storing anything per cell.
+    """
+
+    def __init__(self, nx, ny):
+        self.nx = nx
+        self.ny = ny
+
+    def __contains__(self, key):
+        row, col = key
+        return 0 <= row < self.ny and 0 <= col < self.nx
+
+    def __iter__(self):
+        for row in range(self.ny):
+            for col in range(self.nx):
+                yield (row, col)
+
+    def __len__(self):
+        return self.nx * self.ny
+
+    def keys(self):
+        return iter(self)
+
+
+class TkImageBackend(TkCanvasBackend):
+    """Renders a GridModel as one PhotoImage on a Tkinter Canvas.
+
+    The visible window of the model is converted to RGB via
+    GridModel.compute_color_indices() and scaled to the display
+    resolution with nearest-neighbour sampling. When zoomed out below
+    one screen pixel per cell only the cells sampled by a screen pixel
+    are looked up, giving a downsampled overview. Grid lines are the
+    shared canvas overlay, drawn for the rendered view only.
+
+    Parameters are the same as for TkCanvasBackend.
+    """
+
+    # Screen pixels rendered beyond each edge of the visible area.
+    VIEW_MARGIN = 256
+
+    def __init__(self, root, model, nx, ny, res):
+        self.nx = nx
+        self.ny = ny
+        self.res = res
+        self.image = None
+        self.image_id = None
+        self._view = None  # (x1, y1, x2, y2) screen rectangle of the image
+        self._view_job = None
+        self._rgb_cache = {}
+        self._px_cols = np.zeros(0, dtype=np.intp)
+        self._px_rows = np.zeros(0, dtype=np.intp)
+        super().__init__(root, model, nx, ny, res)
+
+    @property
+    def pixels(self):
+        return _CellRegistry(self.nx, self.ny)
+
+    @pixels.setter
+    def pixels(self, value):
+        # TkCanvasBackend.__init__ and clear() assign a dict here; the
+        # image backend keeps no per-cell registry, so ignore it.
+        pass
+
+    # ------------------------------------------------------------------
+    # Colour conversion
+    # ------------------------------------------------------------------
+
+    def _rgb(self, color):
+        """Resolve a Tk colour name to an (r, g, b) byte tuple (cached)."""
+        rgb = self._rgb_cache.get(color)
+        if rgb is None:
+            r, g, b = self.canvas.winfo_rgb(color)
+            rgb = (r >> 8, g >> 8, b >> 8)
+            self._rgb_cache[color] = rgb
+        return rgb
+
+    # ------------------------------------------------------------------
+    # Rendering
+    # ------------------------------------------------------------------
+
+    def _pixel_map(self, n, res):
+        """Return the grid index shown at each screen pixel along one axis."""
+        size = max(1, int(round(n * res)))
+        index = ((np.arange(size) + 0.5) / res).astype(np.intp)
+        return np.minimum(index, n - 1)
+
+    def _rgb_block(self, y1, y2, x1, x2):
+        """Build the RGB pixels for the screen rectangle [x1, x2) x [y1, y2)."""
+        model_rows, row_pos = np.unique(
+            (self.ny - 1) - self._px_rows[y1:y2], return_inverse=True
+        )
+        model_cols, col_pos = np.unique(self._px_cols[x1:x2], return_inverse=True)
+        if self.res >= 1:
+            # every cell in the window is on screen: read a plain block
+            rows = slice(int(model_rows[0]), int(model_rows[-1]) + 1)
+            cols = slice(int(model_cols[0]), int(model_cols[-1]) + 1)
+        else:
+            # overview: look up only the cells sampled by a screen pixel
+            rows, cols = model_rows[:, None], model_cols[None, :]
+
+        indices, palette = self.model.compute_color_indices(
+            rows=rows, cols=cols, **self._color_kwargs()
+        )
+        lut = np.array([self._rgb(color) for color in palette], dtype=np.uint8)
+        return lut[indices[np.ix_(row_pos.ravel(), col_pos.ravel())]]
+
+    @staticmethod
+    def _photo_image(master, rgb):
+        """Wrap an (h, w, 3) uint8 array into a PhotoImage via a PPM buffer."""
+        height, width = rgb.shape[:2]
+        header = f"P6 {width} {height} 255\n".encode("ascii")
+        return tk.PhotoImage(master=master, data=header + rgb.tobytes(), format="PPM")
+
+    def _render(self, centre=None):
+        """Rebuild the pixel maps and the image from the current model state.
+
+        ``centre`` is an optional (x, y) point in cells that is scrolled
+        to the middle of the canvas, e.g. to keep it in place on zoom.
+        """
+        self.model.pop_dirty()
+        # Row 0 is at the bottom of the canvas.
+        self._px_cols = self._pixel_map(self.nx, self.res)
+        self._px_rows = self._pixel_map(self.ny, self.res)
+        width, height = self._px_cols.size, self._px_rows.size
+        self.canvas.config(scrollregion=(0, 0, width, height))
+        if centre is not None:
+            self.canvas.xview_moveto(
+                max(0.0, centre[0] * self.res - self.canvas.winfo_width() / 2) / width
+            )
+            self.canvas.yview_moveto(
+                max(0.0, centre[1] * self.res - self.canvas.winfo_height() / 2) / height
+            )
+        self._render_view()
+
+    def _visible_rect(self):
+        """Screen rectangle (x1, y1, x2, y2) currently shown by the canvas."""
+        width, height = self._px_cols.size, self._px_rows.size
+        x1 = min(max(0, int(self.canvas.canvasx(0))), width - 1)
+        y1 = min(max(0, int(self.canvas.canvasy(0))), height - 1)
+        x2 = min(width, x1 + max(1, self.canvas.winfo_width()))
+        y2 = min(height, y1 + max(1, self.canvas.winfo_height()))
+        return x1, y1, x2, y2
+
+    def _render_view(self):
+        """Render the visible area plus VIEW_MARGIN into the image."""
+        x1, y1, x2, y2 = self._visible_rect()
+        margin = self.VIEW_MARGIN
+        x1, y1 = max(0, x1 - margin), max(0, y1 - margin)
+        x2 = min(self._px_cols.size, x2 + margin)
+        y2 = min(self._px_rows.size, y2 + margin)
+
+        self.image = self._photo_image(self.canvas, self._rgb_block(y1, y2, x1, x2))
+        if self.image_id is None:
+            self.image_id = self.canvas.create_image(x1, y1, anchor="nw", image=self.image)
+        else:
+            self.canvas.itemconfig(self.image_id, image=self.image)
+            self.canvas.coords(self.image_id, x1, y1)
+        self._view = (x1, y1, x2, y2)
+        self.draw_grid_lines()
+
+    def _grid_line_positions(self):
+        """Grid lines of the rendered view: one at the first pixel of each cell."""
+        x1, y1, x2, y2 = self._view
+        if self.res < self.GRID_LINE_MIN_RES:
+            empty = np.zeros(0, dtype=np.intp)
+            return empty, empty, self._view
+        xs = x1 + np.flatnonzero(self._cell_starts(self._px_cols, x1, x2))
+        ys = y1 + np.flatnonzero(self._cell_starts(self._px_rows, y1, y2))
+        return xs, ys, self._view
+
+    def _create_scroll_bars(self):
+        super()._create_scroll_bars()
+        self.canvas.config(
+            xscrollcommand=self._scroll_command(self.x_scroll),
+            yscrollcommand=self._scroll_command(self.y_scroll),
+        )
+        self.canvas.bind("<Configure>", self._schedule_view_check, add="+")
+
+    def _scroll_command(self, scrollbar):
+        """Scroll command that updates ``scrollbar`` and checks the view."""
+        def command(first, last):
+            scrollbar.set(first, last)
+            self._schedule_view_check()
+        return command
+
+    def _schedule_view_check(self, event=None):
+        """Check once per idle tick whether the image still covers the view."""
+        if self._view_job is None:
+            self._view_job = self.canvas.after_idle(self._check_view)
+
+    def _check_view(self):
+        self._view_job = None
+        if self.image is None or not self.canvas.winfo_exists():
+            return
+        x1, y1, x2, y2 = self._visible_rect()
+        vx1, vy1, vx2, vy2 = self._view
+        if x1 < vx1 or y1 < vy1 or x2 > vx2 or y2 > vy2:
+            self._render_view()
+
+    @staticmethod
+    def _cell_starts(px_map, start, stop):
+        """Boolean mask of the screen pixels in [start, stop) that start a new grid cell."""
+        starts = np.ones(stop - start, dtype=bool)
+        if start > 0:
+            starts[:] = px_map[start:stop] != px_map[start - 1:stop - 1]
+        else:
+            starts[1:] = px_map[1:stop] != px_map[:stop - 1]
+        return starts
+
+    def _cell_extent(self, px_map, index):
+        """Return the [start, stop) screen pixel range of one grid cell."""
+        start = int(np.searchsorted(px_map, index, side="left"))
+        stop = int(np.searchsorted(px_map, index, side="right"))
+        return start, stop
+
+    # ------------------------------------------------------------------
+    # Grid drawing
+    # ------------------------------------------------------------------
+
+    def draw_grid(self, nx, ny, res):
+        """Render the model as a fresh image."""
+        self.nx, self.ny, self.res = nx, ny, res
+        self._render()
+
+    def update_grid(self, nx, ny, res):
+        """Re-render the whole image from the current model state."""
+        self.nx, self.ny, self.res = nx, ny, res
+        self._render()
+
+    def _view_patch(self, x1, x2, y1, y2):
+        """Clip a screen rectangle to the rendered view.
+
+        Returns the clipped (x1, x2, y1, y2) or None if nothing is visible.
+        """
+        if self.image is None:
+            return None
+        vx1, vy1, vx2, vy2 = self._view
+        x1, x2 = max(x1, vx1), min(x2, vx2)
+        y1, y2 = max(y1, vy1), min(y2, vy2)
+        if x2 <= x1 or y2 <= y1:
+            return None
+        return x1, x2, y1, y2
+
+    def update_pixel(self, row, col):
+        """Repaint the screen pixels of a single grid cell."""
+        if self.image is None:
+            return
+        x1, x2 = self._cell_extent(self._px_cols, col)
+        y1, y2 = self._cell_extent(self._px_rows, (self.ny - 1) - row)
+        patch = self._view_patch(x1, x2, y1, y2)
+        if patch is None:
+            return
+        x1, x2, y1, y2 = patch
+        vx1, vy1 = self._view[:2]
+        color = self.model.get_color(row, col, **self._color_kwargs()) or "white"
+        self.image.put(color, to=(x1 - vx1, y1 - vy1, x2 - vx1, y2 - vy1))
+
+    def flush_dirty(self):
+        """Copy a freshly rendered patch of the changed, visible cells into the image."""
+        region = self.model.pop_dirty()
+        if region is None or self.image is None:
+            return
+        rows, cols = region
+        x1 = int(np.searchsorted(self._px_cols, cols.start, side="left"))
+        x2 = int(np.searchsorted(self._px_cols, cols.stop - 1, side="right"))
+        # Screen rows run top-down, model rows bottom-up.
+        y1 = int(np.searchsorted(self._px_rows, self.ny - rows.stop, side="left"))
+        y2 = int(np.searchsorted(self._px_rows, self.ny - 1 - rows.start, side="right"))
+        patch = self._view_patch(x1, x2, y1, y2)
+        if patch is None:
+            return
+        x1, x2, y1, y2 = patch
+        vx1, vy1 = self._view[:2]
+        image = self._photo_image(self.canvas, self._rgb_block(y1, y2, x1, x2))
+        self.image.tk.call(self.image, "copy", image, "-to", x1 - vx1, y1 - vy1)
+
+    # ------------------------------------------------------------------
+    # Zoom
+    # ------------------------------------------------------------------
+
+    def zoom(self, factor):
+        """Re-render at the new display resolution, keeping the view centre."""
+        x1, y1, x2, y2 = self._visible_rect()
+        centre = ((x1 + x2) / 2 / self.res, (y1 + y2) / 2 / self.res)
+        self.res *= factor
+        self._render(centre)
+
+    # ------------------------------------------------------------------
+    # Utility
+    # ------------------------------------------------------------------
+
+    def clear(self):
+        """Delete all canvas objects and drop the image."""
+        self.canvas.delete("all")
+        self.image = None
+        self.image_id = None
+        self._view = None
+        self._reset_grid_lines()
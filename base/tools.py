@@ -0,0 +1,120 @@
+"""
+Layer assignments of the PALMPaint surface tools.
+
+Each tool writes a fixed set of layer values to every cell it touches:
+painting water clears vegetation, pavement and buildings, painting a
+building clears all surface types, and so on. The functions here return
+those assignments as plain dicts, so the GUI tools and headless scripts
+share one definition. No Tkinter imports.
+
+    Copyright (C) 2025  Pierre Lampe
+    Licensed under the GNU General Public License v3 or later.
+"""
+
+INT_FILL = -127
+FLOAT_FILL = -9999.0
+
+
+def vegetation_values(surface_config, vegetation_type):
+    """Vegetation tool: set vegetation and its soil, clear everything else."""
+    veg_def = surface_config["vegetation"]["types"][vegetation_type]
+    return {
+        "vegetation_type": vegetation_type,
+        "soil_type": veg_def.get("soil_type", surface_config["soil"]["default_type"]),
+        "pavement_type": INT_FILL,
+        "water_type": INT_FILL,
+        "building_id": INT_FILL,
+        "building_height": INT_FILL,
+        "building_type": INT_FILL,
+        "water_pars": FLOAT_FILL,
+    }
+
+
+def pavement_values(surface_config, pavement_type):
+    """Pavement tool: set pavement and its soil, clear everything else."""
+    pav_def = surface_config["pavement"]["types"][pavement_type]
+    return {
+        "pavement_type": pavement_type,
+        "soil_type": pav_def.get("soil_type", surface_config["soil"]["default_type"]),
+        "vegetation_type": INT_FILL,
+        "water_type": INT_FILL,
+        "building_id": INT_FILL,
+        "building_height": INT_FILL,
+        "building_type": INT_FILL,
+        "water_pars": FLOAT_FILL,
+    }
+
+
+def water_values(surface_config, water_type, water_temperature=None):
+    """Water tool: set water type and temperature, clear everything else.
+
+    The temperature defaults to the one configured for the water type.
+    """
+    if water_temperature is None:
+        water_temperature = surface_config["water"]["types"][water_type]["water_temperature"]
+    return {
+        "water_type": water_type,
+        "water_temperature": float(water_temperature),
+        "pavement_type": INT_FILL,
+        "vegetation_type": INT_FILL,
+        "soil_type": INT_FILL,
+        "building_id": INT_FILL,
+        "building_height": INT_FILL,
+        "building_type": INT_FILL,
+    }
+
+
+def building_values(surface_config, building_id=1, building_height=10.0, building_type=2):
+    """Building tool: set building attributes, clear all surface types."""
+    return {
+        "building_id": building_id,
+        "building_height": building_height,
+        "building_type": building_type,
+        "pavement_type": INT_FILL,
+        "vegetation_type": INT_FILL,
+        "soil_type": INT_FILL,
+        "water_type": INT_FILL,
+        "water_pars": FLOAT_FILL,
+    }
+
+
+def soil_values(surface_config, soil_type):
+    """Soil tool: set the soil type only (see soil_paintable)."""
+    return {"soil_type": soil_type}
+
+
+def height_values(surface_config, zt):
+    """Height tool: set the terrain height only."""
+    return {"zt": float(zt)}
+
+
+TOOLS = {
+    "vegetation": vegetation_values,
+    "pavement": pavement_values,
+    "water": water_values,
+    "building": building_values,
+    "soil": soil_values,
+    "height": height_values,
+}
+
+
+def tool_values(surface_config, tool, **params):
+    """Return the layer assignment of ``tool`` for the given parameters."""
+    try:
+        values = TOOLS[tool]
+    except KeyError:
+        raise ValueError(f"Unknown tool '{tool}', expected one of {sorted(TOOLS)}") from None
+    return values(surface_config, **params)
+
+
+def soil_paintable(model, rows, cols):
+    """Mask of cells in the window that the soil tool may change.
+
+    Water and building cells keep their soil type.
+    """
+    is_water = model.water_type[rows, cols] > INT_FILL
+    is_building = (
+        (model.building_id[rows, cols] > INT_FILL)
+        | (model.building_height[rows, cols] > 0.0)
+    )
+    return ~(is_water | is_building)
@@ -18,21 +18,32 @@ simple SDs for PALM.
     along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
 
-import copy
 import json
-import math
 import os
+import queue
+import threading
+import time
 import tkinter as tk
 import tkinter.ttk as ttk
 import tkinter.filedialog as fd
+import tkinter.simpledialog
+
+import numpy as np
 
 import base.report as report
+import base.brush as brush
+import base.fill as fill
 import base.framework as framework
 import base.gridmodel as gridmodel
+import base.history as history
+import base.journal as journal
+import base.project as project
 import base.tkbackend as tkbackend
-from base.create_sd import Save
-from base.load_sd import Load
+import base.tkimagebackend as tkimagebackend
+from base.create_sd import SaveModel
+from base.load_sd import read_bands
 import base.surface_config as surface_config
+import base.tools as tools
 import base.welcome_screen as welcome_screen
 
 
@@ -46,6 +57,39 @@ class PaintApplication(framework.Framework):
     end_y = 0
     current_item = None
     brush_size = 1
+    # Bucket fill: set by the Edit menu, consumed by the next click.
+    bucket_fill_armed = False
+    fill_connectivity = 4  # 4 or 8 neighbours
+    # Drag painting: motion samples are coalesced per idle tick.
+    motion_job = None
+    last_cell = None
+    stroke_path = None
+    # Grids with more cells than this are drawn as a single image.
+    image_backend_min_cells = 256 * 256
+    # Grids with more cells than this keep their layers in tiles.
+    tiled_model_min_cells = 8192 * 8192
+    # Memory available for undo/redo patches in bytes.
+    undo_memory_budget = 256 * 1024 ** 2
+    # NetCDF output: zlib level (None: uncompressed) and (ny, nx) chunks.
+    netcdf_compression = None
+    netcdf_chunks = None
+    # Background NetCDF save: worker thread and its progress messages.
+    save_thread = None
+    save_messages = None
+    # Background NetCDF load: band queue (None when idle), its stop flag,
+    # whether its header has replaced the model yet, and how many bands
+    # may wait in the queue.
+    load_messages = None
+    load_cancel = None
+    load_replaced_model = False
+    load_queue_bands = 8
+    # Autosave: every edit is journaled to a session directory below
+    # autosave_directory; the journal is compacted into its base this
+    # often while there are new edits.
+    autosave_directory = journal.DEFAULT_DIRECTORY
+    autosave_interval_ms = 5 * 60 * 1000
+    autosave = None
+    autosave_model = None  # model the current journal is based on
     
 
     tool_bar_functions = (
@@ -118,6 +162,8 @@ class PaintApplication(framework.Framework):
     }  
     
     def execute_selected_method(self):
+        if self.is_loading():
+            return  # the bands still loading would overwrite the edit
         self.current_item = None
         if self.active_view == "heightmap":
             self.height_tool()
@@ -137,71 +183,110 @@ class PaintApplication(framework.Framework):
 
     def height_tool(self):
         """Apply height editing mode (Raise/Lower/Set Height) to brush pixels."""
-        center_row, center_col = self.get_pixel_position()
-        affected_pixels = self.get_pixels_in_brush(center_row, center_col)
-        step = float(self.original_res) if self.original_res > 0 else 1.0
+        rows, cols, mask = self.get_brush_footprint()
+        new_height = self.new_heights(self.model.zt[rows, cols])
+        self.model.write_region(rows, cols, mask, zt=new_height)
+        self.update_canvas()
 
-        for row, col in affected_pixels:
-            if (row, col) not in self.pixels:
-                continue
-
-            current = max(0.0, float(self.model.zt[row, col]))
-            if self.selected_height_tool_bar_function == "zt_raise":
-                new_height = self.quantize_height(current + step)
-            elif self.selected_height_tool_bar_function == "zt_lower":
-                new_height = max(0.0, self.quantize_height(current - step))
-            else:
-                new_height = self.quantize_height(self.height_set_value)
+    def new_heights(self, zt):
+        """Heights after applying the selected height mode to the array ``zt``."""
+        step = float(self.original_res) if self.original_res > 0 else 1.0
 
-            self.update_pixel(row, col, zt=new_height)
-            self.update_canvas(row, col)
+        current = np.maximum(zt, 0.0, dtype=np.float64)
+        if self.selected_height_tool_bar_function == "zt_raise":
+            new_height = current + step
+        elif self.selected_height_tool_bar_function == "zt_lower":
+            new_height = current - step
+        else:
+            new_height = np.full_like(current, self.height_set_value)
+        return np.maximum(np.round(new_height / step) * step, 0.0)
 
     def soil_tool(self):
         """Paint soil types, but never overwrite water or building cells."""
-        center_row, center_col = self.get_pixel_position()
-        affected_pixels = self.get_pixels_in_brush(center_row, center_col)
+        self.apply_brush(
+            tools.soil_values(self.surface_config, self.selected_soil_type),
+            soil=True,
+        )
+        
+    def on_mouse_button_pressed_motion(self, event):
+        """Queue the motion sample; all samples are painted on the next idle tick."""
+        if self.bucket_fill_armed:
+            return
+        self.pending_motion.append(
+            (self.canvas.canvasx(event.x), self.canvas.canvasy(event.y))
+        )
+        if self.motion_job is None:
+            self.motion_job = self.root.after_idle(self.flush_motion)
 
-        for row, col in affected_pixels:
-            if (row, col) not in self.pixels:
-                continue
+    def flush_motion(self):
+        """Paint the stroke through all queued motion samples at once.
 
-            is_water = self.model.water_type[row, col] > self.model.INT_FILL
-            is_building = (
-                self.model.building_id[row, col] > self.model.INT_FILL
-                or self.model.building_height[row, col] > 0.0
-            )
-            if is_water or is_building:
-                continue
+        The path from the last painted cell through every sample is
+        rasterised with Bresenham lines and the tool is applied once to
+        the brush swept along it, followed by a single repaint.
+        """
+        self.motion_job = None
+        if not self.pending_motion:
+            return
+        rows, cols = [], []
+        last_row, last_col = self.last_cell or self.get_pixel_position()
+        for x, y in self.pending_motion:
+            row, col = self.get_pixel_position(x, y)
+            if (row, col) != (last_row, last_col):
+                line_rows, line_cols = brush.line(last_row, last_col, row, col)
+                # The start cell was painted with the previous segment.
+                rows.append(line_rows[1:])
+                cols.append(line_cols[1:])
+                last_row, last_col = row, col
+        self.start_x, self.start_y = self.pending_motion[-1]
+        self.pending_motion.clear()
+        self.last_cell = (last_row, last_col)
+        if not rows:
+            return
 
-            self.update_pixel(row, col, soil_type=self.selected_soil_type)
-            self.update_canvas(row, col)
-        
-    def on_mouse_button_pressed_motion(self, event):
-        self.start_x = self.canvas.canvasx(event.x)
-        self.start_y = self.canvas.canvasy(event.y)
-        #self.canvas.delete(self.current_item)
-        self.execute_selected_method()  
+        self.stroke_path = (np.concatenate(rows), np.concatenate(cols))
+        try:
+            self.execute_selected_method()
+        finally:
+            self.stroke_path = None
+
+    def finish_motion(self):
+        """Paint queued motion samples now and end the stroke."""
+        if self.motion_job is not None:
+            self.root.after_cancel(self.motion_job)
+            self.flush_motion()
+        self.last_cell = None
                        
-    def get_pixel_position(self):
-        col = int(self.start_x // self.res)     
-        #row = int(self.start_y // self.res)
-        row = (self.ny - 1) - int(self.start_y // self.res)
+    def get_pixel_position(self, x=None, y=None):
+        """Grid cell under canvas position (x, y), by default the last click."""
+        x = self.start_x if x is None else x
+        y = self.start_y if y is None else y
+        col = int(x // self.res)
+        row = (self.ny - 1) - int(y // self.res)
         
         return row, col
     
-    def get_pixels_in_brush(self, center_row, center_col):
+    def get_brush_footprint(self):
+        """Return ``(rows, cols, mask)`` of the brush under the cursor.
+
+        While a drag is painted, the brush is swept along stroke_path.
         """
-        Get all pixels within the brush radius around the center pixel.
+        if self.stroke_path is not None:
+            rows, cols = self.stroke_path
+            return brush.stroke_footprint(rows, cols, self.brush_size, self.ny, self.nx)
+        center_row, center_col = self.get_pixel_position()
+        return brush.footprint(center_row, center_col, self.brush_size, self.ny, self.nx)
+
+    def apply_brush(self, values, soil=False):
+        """Write a tool's layer values to all brush cells in one go.
+
+        With ``soil`` set, water and building cells are left untouched.
         """
-        affected_pixels = []
-        for row in range(center_row - self.brush_size // 2, center_row + self.brush_size // 2  + 1):
-            for col in range(center_col - self.brush_size // 2, center_col + self.brush_size // 2 + 1):
-                # Calculate the distance from the center
-                if (0 <= row < self.ny) and (0 <= col < self.nx):  # Ensure within bounds
-                    distance = math.sqrt((center_row - row)**2 + (center_col - col)**2)
-                    if distance <= self.brush_size:
-                        affected_pixels.append((row, col))
-        return affected_pixels
+        rows, cols, mask = self.get_brush_footprint()
+        if soil:
+            mask = mask & tools.soil_paintable(self.model, rows, cols)
+        self.model.write_region(rows, cols, mask, **values)
+        self.update_canvas()
     
     @property
     def canvas(self):
@@ -213,9 +298,9 @@ class PaintApplication(framework.Framework):
         """Convenience accessor — delegates to the active render backend."""
         return self.backend.pixels
 
-    def update_canvas(self, y, x):
-        """Update the canvas for a specific pixel."""
-        self.backend.update_pixel(y, x)
+    def update_canvas(self):
+        """Repaint the cells changed since the last update in one batch."""
+        self.backend.flush_dirty()
 
     def update_pixel(self, row, col, **kwargs):
         """Write data layer values to the model. Display keys are ignored."""
@@ -225,178 +310,89 @@ class PaintApplication(framework.Framework):
             
     def vegetation(self):
         """Apply vegetation tool to affected pixels."""
-        center_row, center_col = self.get_pixel_position()
-        affected_pixels = self.get_pixels_in_brush(center_row, center_col)
-        veg_type = self.selected_vegetation_type
-        
-        veg_def = self.get_vegetation_definition(veg_type)
-        soil_type = veg_def.get("soil_type", self.surface_config["soil"]["default_type"])
-
-        for row, col in affected_pixels:
-            if (row, col) in self.pixels:
-                self.update_pixel(
-                    row, col,
-                    vegetation_type=veg_type,
-                    soil_type= soil_type,
-                    pavement_type=-127,
-                    water_type=-127,
-                    building_id=-127,
-                    building_height=-127,
-                    building_type=-127,
-                )
-                self.model.clear_water_parameters(row, col)
-                self.update_canvas(row, col)
+        self.apply_brush(
+            tools.vegetation_values(self.surface_config, self.selected_vegetation_type)
+        )
 
     def bucket_fill(self):
-        self.save_state()
-        if self.active_view == "soil":
-            for (row, col) in self.pixels.keys():
-                is_water = self.model.water_type[row, col] > self.model.INT_FILL
-                is_building = (
-                    self.model.building_id[row, col] > self.model.INT_FILL
-                    or self.model.building_height[row, col] > 0.0
-                )
-                if is_water or is_building:
-                    continue
-                self.update_pixel(row, col, soil_type=self.selected_soil_type)
-                self.update_canvas(row, col)
-            return
-
-        if self.selected_tool_bar_function == "vegetation":
-            veg_type = self.selected_vegetation_type
-            veg_def = self.get_vegetation_definition(veg_type)
-            soil_type = veg_def.get("soil_type", self.surface_config["soil"]["default_type"])
-            for (row, col) in self.pixels.keys():
-                self.update_pixel(
-                    row, col,
-                    vegetation_type=veg_type,
-                    soil_type= soil_type,
-                    pavement_type=-127,
-                    water_type=-127,
-                    building_id=-127,
-                    building_height=-127,
-                    building_type=-127
-                )
-                self.model.clear_water_parameters(row, col)
-                self.update_canvas(row, col)
-        elif self.selected_tool_bar_function == "pavement":
-            pavement_type = self.selected_pavement_type
-            soil_type = self.surface_config["soil"]["default_type"]
-
-            for (row, col) in self.pixels.keys():
-                self.update_pixel(
-                    row, col,
-                    pavement_type=pavement_type,
-                    soil_type=soil_type,
-                    vegetation_type=-127,
-                    water_type=-127,
-                    building_id=-127,
-                    building_height=-127,
-                    building_type=-127
-                )
-                self.model.clear_water_parameters(row, col)
-                self.update_canvas(row, col)
-        elif self.selected_tool_bar_function == "water":
+        """Arm the bucket tool: the next click fills the region under the cursor."""
+        self.bucket_fill_armed = True
+        self.canvas.config(cursor="spraycan")
+
+    def selected_tool_values(self):
+        """Layer assignment of the tool selected in the tool bar."""
+        tool = self.selected_tool_bar_function
+        if tool == "vegetation":
+            return tools.vegetation_values(self.surface_config, self.selected_vegetation_type)
+        if tool == "pavement":
+            return tools.pavement_values(self.surface_config, self.selected_pavement_type)
+        if tool == "water":
             self.update_water_temperature()
-            water_type = self.selected_water_type
-            water_temperature = self.selected_water_temperature
-
-            for (row, col) in self.pixels.keys():
-                self.update_pixel(
-                    row, col,
-                    water_type=water_type,
-                    pavement_type=-127,
-                    vegetation_type=-127,
-                    soil_type=-127,
-                    building_id=-127,
-                    building_height=-127,
-                    building_type=-127
-                )
-                self.model.set_water_parameter(0, row, col, water_temperature)
-                self.update_canvas(row, col)
-        elif self.selected_tool_bar_function == "building":
-            for (row, col) in self.pixels.keys():
-                self.update_pixel(row, col,
-                                building_id=self.building_id,
-                                building_height=self.building_height,
-                                building_type=self.building_type,
-                                pavement_type=-127,
-                                vegetation_type=-127,
-                                soil_type=-127,
-                                water_type=-127)
-                self.model.clear_water_parameters(row, col)
-                self.update_canvas(row, col)
+            return tools.water_values(
+                self.surface_config, self.selected_water_type, self.selected_water_temperature
+            )
+        return tools.building_values(
+            self.surface_config,
+            building_id=self.building_id,
+            building_height=self.building_height,
+            building_type=self.building_type,
+        )
+
+    def fill_region(self, row, col):
+        """Fill the connected region sharing the surface class of (row, col).
+
+        The region is taken from the active view (land cover, soil or
+        height) with fill_connectivity (4 or 8) and written in one masked
+        assignment.
+        """
+        if self.is_loading():
+            return
+        if not (0 <= row < self.ny and 0 <= col < self.nx):
+            return
+        classes = fill.surface_classes(self.model, self.active_view)
+        rows, cols, mask = fill.connected_region(classes, row, col, self.fill_connectivity)
+        if self.active_view == "heightmap":
+            values = {"zt": self.new_heights(self.model.zt[rows, cols])}
+        elif self.active_view == "soil":
+            values = tools.soil_values(self.surface_config, self.selected_soil_type)
+            mask = mask & tools.soil_paintable(self.model, rows, cols)
+        else:
+            values = self.selected_tool_values()
+        self.model.write_region(rows, cols, mask, **values)
+        self.update_canvas()
         
     def pavement(self):
-        center_row, center_col = self.get_pixel_position()
-        affected_pixels = self.get_pixels_in_brush(center_row, center_col)
-        
-        pavement_type = self.selected_pavement_type
-        pav_def = self.get_pavement_definition(pavement_type)
-        soil_type = pav_def.get("soil_type", self.surface_config["soil"]["default_type"])
-    
-        for row, col in affected_pixels:
-            if (row, col) in self.pixels:
-                self.update_pixel(row, col,
-                                  pavement_type=pavement_type,
-                                  soil_type=soil_type,
-                                  vegetation_type=-127,
-                                  water_type=-127,
-                                  building_id=-127,
-                                  building_height=-127,
-                                  building_type=-127)
-                self.model.clear_water_parameters(row, col)
-                self.update_canvas(row, col)
+        self.apply_brush(
+            tools.pavement_values(self.surface_config, self.selected_pavement_type)
+        )
         
     def water(self):
         """Apply water tool to affected pixels."""
         self.update_water_temperature()
-        
-        center_row, center_col = self.get_pixel_position()
-        affected_pixels = self.get_pixels_in_brush(center_row, center_col)
-
-        water_type = self.selected_water_type
-        water_temperature = self.selected_water_temperature
-
-        for row, col in affected_pixels:
-            if (row, col) in self.pixels:
-                self.update_pixel(
-                    row, col,
-                    water_type=water_type,
-                    pavement_type=-127,
-                    vegetation_type=-127,
-                    soil_type=-127,
-                    building_id=-127,
-                    building_height=-127,
-                    building_type=-127
-                )
-                self.model.set_water_parameter(0, row, col, water_temperature)
-                self.update_canvas(row, col)
+        self.apply_brush(
+            tools.water_values(
+                self.surface_config,
+                self.selected_water_type,
+                self.selected_water_temperature,
+            )
+        )
         
     def building(self):
-        
-        center_row, center_col = self.get_pixel_position()
-        affected_pixels = self.get_pixels_in_brush(center_row, center_col)
-        
-        for row, col in affected_pixels:
-            if (row, col) in self.pixels:
-                self.update_pixel(row, col, 
-                                  building_id=self.building_id, 
-                                  building_height=self.building_height, 
-                                  building_type=self.building_type,
-                                  pavement_type=-127, 
-                                  vegetation_type=-127, 
-                                  soil_type=-127, 
-                                  water_type=-127, 
-                                  color="black")
-                self.model.clear_water_parameters(row, col)
-                self.update_canvas(row, col)
+        self.apply_brush(
+            tools.building_values(
+                self.surface_config,
+                building_id=self.building_id,
+                building_height=self.building_height,
+                building_type=self.building_type,
+            )
+        )
                 
  # ------------------ File Menu Operations ------------------
     
     def new_project(self):
         if not self.confirm_action("New Project", "Are you sure you want to start a new project? Unsaved work will be lost."):
          return
+        self.cancel_load()
 
         self.backend.clear()
 
@@ -412,8 +408,11 @@ class PaintApplication(framework.Framework):
         return tk.messagebox.askyesno(title, message)
         
         
+    def netcdf_options(self):
+        return {"compression": self.netcdf_compression, "chunks": self.netcdf_chunks}
+
     def save_netcdf(self):
-        Save(self.model.to_legacy_dict(), self.original_res, self.origin, self.surface_config)
+        self.save_in_background()
         
     def save_as_netcdf(self):
         file_path = fd.asksaveasfilename(
@@ -422,12 +421,69 @@ class PaintApplication(framework.Framework):
         )
         if not file_path:
             return
-        Save(self.model.to_legacy_dict(), self.original_res, self.origin, self.surface_config, file_path)
+        self.save_in_background(file_path)
+
+    def save_in_background(self, file_path=None):
+        """
+        Write the static driver on a worker thread so painting can go on.
+
+        The thread writes a snapshot of the model taken now; progress is
+        passed back through a queue and shown by poll_save() on the Tk
+        thread.
+        """
+        if self.refuse_while_loading("Save NetCDF"):
+            return
+        if self.save_thread is not None and self.save_thread.is_alive():
+            tk.messagebox.showinfo("Save NetCDF", "The previous save is still running.")
+            return
+
+        args = (self.model.snapshot(), self.origin) + ((file_path,) if file_path else ())
+        messages = self.save_messages = queue.Queue()
+
+        def save():
+            try:
+                SaveModel(
+                    *args,
+                    progress=lambda fraction, name: messages.put(("progress", fraction, name)),
+                    **self.netcdf_options(),
+                )
+                messages.put(("done", 1.0, file_path or "quicksave"))
+            except Exception as e:
+                messages.put(("error", 0.0, e))
+
+        # not a daemon: quitting waits for the file to be complete
+        self.save_thread = threading.Thread(target=save, name="netcdf-save")
+        self.save_thread.start()
+        self.status_label.config(text="Saving NetCDF ...")
+        self.root.after(100, self.poll_save)
+
+    def poll_save(self):
+        """Show the progress of the background save (runs on the Tk thread)."""
+        message = None
+        while True:
+            try:
+                message = self.save_messages.get_nowait()
+            except queue.Empty:
+                break
+            if message[0] != "progress":
+                break
+
+        if message is None or message[0] == "progress":
+            if message is not None:
+                self.status_label.config(text=f"Saving NetCDF {message[1]:.0%}")
+            self.root.after(100, self.poll_save)
+        elif message[0] == "done":
+            self.status_label.config(text=f"Saved {os.path.basename(message[2])}")
+        else:
+            self.status_label.config(text="Save failed")
+            tk.messagebox.showerror("Save NetCDF", f"Error saving NetCDF file: {message[2]}")
         
     def load_project_netcdf(self):
         """
-        Open a file dialog to let the user choose a NetCDF project file,
-        then load it using load_sd.Load() and update the canvas.
+        Open a file dialog to let the user choose a NetCDF project file
+        and load it in the background: a worker thread reads row bands
+        with read_bands(), poll_load() copies them into a new
+        GridModel on the Tk thread and repaints each band as it arrives.
         """
         file_path = fd.askopenfilename(
             defaultextension="",
@@ -436,44 +492,267 @@ class PaintApplication(framework.Framework):
         if not file_path:
             return  # User cancelled
 
-        try:
-            grid, nx, ny, res, origin = Load(file_path)
-        except Exception as e:
-            print(f"Error loading NetCDF file: {e}")
-            return
-        
-        self.nx = nx
-        self.ny = ny
-        self.original_res = res
-        self.res = res
+        self.cancel_load()
+        messages = self.load_messages = queue.Queue(maxsize=self.load_queue_bands)
+        cancel = self.load_cancel = threading.Event()
+        self.load_replaced_model = False
+
+        def send(message):
+            # wait for room in the queue, unless the load was cancelled
+            while not cancel.is_set():
+                try:
+                    messages.put(message, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def load():
+            bands = read_bands(file_path)
+            try:
+                if send(("header", next(bands))):
+                    for band in bands:
+                        if not send(("band", band)):
+                            return
+                    send(("done", file_path))
+            except Exception as e:
+                send(("error", e))
+            finally:
+                bands.close()
+
+        threading.Thread(target=load, name="netcdf-load", daemon=True).start()
+        self.status_label.config(text="Loading NetCDF ...")
+        self.root.after(20, self.poll_load, messages)
+
+    def poll_load(self, messages):
+        """Apply the bands read so far (runs on the Tk thread)."""
+        if messages is not self.load_messages:
+            return  # cancelled or superseded by another load
+        deadline = time.perf_counter() + 0.05
+        while time.perf_counter() < deadline:
+            try:
+                kind, payload = messages.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "header":
+                nx, ny, res, origin = payload
+                self.set_model(
+                    gridmodel.GridModel(
+                        nx, ny, res, self.surface_config,
+                        tiled=nx * ny > self.tiled_model_min_cells,
+                    ),
+                    origin,
+                )
+                self.load_replaced_model = True
+                self.backend.update_grid(self.nx, self.ny, self.res)
+            elif kind == "band":
+                rows, layers = payload
+                self.model.write_band(rows, layers)
+                self.status_label.config(text=f"Loading NetCDF {rows.stop / self.ny:.0%}")
+            elif kind == "done":
+                self.load_messages = None
+                self.backend.flush_dirty()
+                self.status_label.config(text=f"Loaded {os.path.basename(payload)}")
+                print(f"Loaded NetCDF project from {payload}")
+                return
+            else:
+                self.load_messages = None
+                self.status_label.config(text="Load failed")
+                print(f"Error loading NetCDF file: {payload}")
+                message = f"Error loading NetCDF file: {payload}"
+                if self.load_replaced_model:
+                    message += (
+                        "\n\nThe grid is incomplete: only the rows read before "
+                        "the error were loaded."
+                    )
+                tk.messagebox.showerror("Load NetCDF", message)
+                return
+        self.backend.flush_dirty()
+        self.root.after(20, self.poll_load, messages)
+
+    def cancel_load(self):
+        """Stop a running background load; the bands read so far stay."""
+        if self.load_cancel is not None:
+            self.load_cancel.set()
+        self.load_messages = None
+
+    def is_loading(self):
+        return self.load_messages is not None
+
+    def refuse_while_loading(self, title):
+        """Tell the user that ``title`` has to wait for the running load.
+
+        Returns True if a load is running and the action must not start.
+        """
+        if not self.is_loading():
+            return False
+        tk.messagebox.showinfo(
+            title, "A NetCDF file is still loading. Please wait until it has finished."
+        )
+        return True
+
+    def set_model(self, model, origin):
+        """Replace the edited GridModel, e.g. after loading a file.
+
+        Resets the undo history and prepares a matching, empty backend;
+        the caller redraws the grid.
+        """
+        self.nx = model.nx
+        self.ny = model.ny
+        self.original_res = model.res
+        self.res = model.res
         self.origin = origin
-        self.model = gridmodel.GridModel.from_legacy_dict(grid, nx, ny, res, self.surface_config)
+        self.model = model
         self.backend.model = self.model
+        self.history.clear()
         self.rescale_grid()
+        self.ensure_backend()
         self.backend.clear()
-        self.backend.update_grid(self.nx, self.ny, self.res)
-        print(f"Loaded NetCDF project from {file_path}")    
+
+    def project_view_settings(self):
+        """View settings stored in project files."""
+        return {
+            "active_view": self.active_view,
+            "show_grid_lines": self.show_grid_lines,
+            "height_view_min": self.height_view_min,
+            "height_view_levels": self.height_view_levels,
+            "height_set_value": self.height_set_value,
+            "brush_size": self.brush_size,
+        }
+
+    def save_project(self):
+        if self.refuse_while_loading("Save Project"):
+            return
+        file_path = fd.asksaveasfilename(
+            defaultextension=project.PROJECT_EXTENSION,
+            filetypes=[("PALMPaint projects", "*" + project.PROJECT_EXTENSION), ("All files", "*")]
+        )
+        if not file_path:
+            return
+        project.SaveProject(self.model, self.origin, file_path, self.project_view_settings())
+
+    def open_project(self):
+        """
+        Open a PALMPaint project file. The layers are memory-mapped, so
+        large projects open immediately and load while they are viewed.
+        """
+        file_path = fd.askopenfilename(
+            filetypes=[("PALMPaint projects", "*" + project.PROJECT_EXTENSION), ("All files", "*")]
+        )
+        if not file_path:
+            return  # User cancelled
+
+        self.cancel_load()
+        try:
+            model, origin, view = project.LoadProject(file_path, self.surface_config)
+        except Exception as e:
+            print(f"Error opening project file: {e}")
+            return
+
+        self.set_model(model, origin)
+        self.apply_view_settings(view)
+        print(f"Opened project {file_path}")
+
+    def apply_view_settings(self, view):
+        """Restore view settings stored by project_view_settings()."""
+        self.show_grid_lines = bool(view.get("show_grid_lines", self.show_grid_lines))
+        self.height_view_min = float(view.get("height_view_min", self.height_view_min))
+        self.height_view_levels = int(view.get("height_view_levels", self.height_view_levels))
+        self.height_set_value = float(view.get("height_set_value", self.height_set_value))
+        self.brush_size = int(view.get("brush_size", self.brush_size))
+        self.brush_size_slider.set(self.brush_size)
+        self.backend.set_height_view_config(self.height_view_min, self.original_res, self.height_view_levels)
+        self.backend.set_grid_lines_visible(self.show_grid_lines)
+        self.set_active_view(view.get("active_view", self.active_view))
     
+    # ------------------ Autosave ------------------
+
+    def start_autosave(self):
+        """Journal all further edits, after offering to restore a session
+        of a PALMPaint that was not closed properly.
+
+        Sessions of PALMPaints that are still running are never touched.
+        """
+        self.autosave = journal.Journal(self.autosave_directory)
+        orphan = journal.find_orphan(self.autosave_directory)
+        if orphan is not None:
+            if tk.messagebox.askyesno(
+                "Recover session",
+                "PALMPaint was not closed properly. Restore the autosaved session?",
+            ):
+                self.recover_session(*orphan)
+            else:
+                journal.discard(*orphan)
+        self.root.after(self.autosave_interval_ms, self.autosave_tick)
+
+    def recover_session(self, directory, lock):
+        """Restore an orphaned session; its files are deleted once this
+        session's autosave holds the restored model."""
+        try:
+            recovered = journal.recover(directory, self.surface_config)
+        except Exception as e:
+            lock.close()  # keep the files, a later start may retry
+            print(f"Error recovering the autosaved session: {e}")
+            return
+        if recovered is None:
+            journal.discard(directory, lock)
+            return
+        model, origin, view, replayed = recovered
+        self.set_model(model, origin)
+        self.apply_view_settings(view)
+        self.autosave_snapshot(replaces=(directory, lock))
+        print(f"Recovered autosaved session ({replayed} edits replayed)")
+
+    def autosave_snapshot(self, replaces=None):
+        """Write the current model as the base of a new journal.
+
+        The snapshot is copy-on-write, the writer thread saves it.
+        """
+        self.autosave_model = self.model
+        self.autosave.snapshot(
+            self.model.snapshot(), self.origin, self.project_view_settings(), replaces
+        )
+
+    def journal_patch(self, patch, reverse=False):
+        """EditHistory listener: append an applied patch to the journal.
+
+        The first edit of a new or loaded model snapshots it first.
+        """
+        if self.autosave is None:
+            return
+        if self.autosave_model is not self.model:
+            self.autosave_snapshot()
+        self.autosave.record(patch, reverse)
+
+    def autosave_tick(self):
+        """Fold the journal into its base if there are new edits."""
+        if self.autosave.records and not self.autosave.busy:
+            self.autosave.compact()
+        self.root.after(self.autosave_interval_ms, self.autosave_tick)
+
+    def stop_autosave(self):
+        """Clean exit: finish writing and delete the autosave files."""
+        if self.autosave is not None:
+            self.autosave.close(discard_files=True)
+            self.autosave = None
+
     def save_state(self):
-        self.undo_stack.append(copy.deepcopy(self.model))
+        """Start recording an undoable edit (closed by end_state)."""
+        self.history.begin(self.model)
+
+    def end_state(self):
+        """Store the edit recorded since save_state as one undo step."""
+        self.history.commit()
         
     def undo(self, event=None):
-        if self.undo_stack:
-            state = self.undo_stack.pop()
-            self.redo_stack.append(copy.deepcopy(self.model))
-            self.model = state
-            self.backend.model = self.model
-            self.backend.update_grid(self.nx, self.ny, self.res)
+        if self.history.undo(self.model):
+            self.update_canvas()
         else:
             print("Nothing to undo.")
 
     def redo(self, event=None):
-        if self.redo_stack:
-            state = self.redo_stack.pop()
-            self.undo_stack.append(copy.deepcopy(self.model))
-            self.model = state
-            self.backend.model = self.model
-            self.backend.update_grid(self.nx, self.ny, self.res)
+        if self.history.redo(self.model):
+            self.update_canvas()
         else:
             print("Nothing to redo.")
 
@@ -490,8 +769,8 @@ class PaintApplication(framework.Framework):
         desired_width = int(screen_width * 0.8)
         desired_height = int(screen_height * 0.8)
 
-        # Calculate new resolution (keep the aspect ratio)
-        computed_res = int(min(desired_width / self.nx, desired_height / self.ny))
+        # Calculate new resolution (keep the aspect ratio), at least one screen pixel per cell
+        computed_res = max(1, int(min(desired_width / self.nx, desired_height / self.ny)))
 
         # Apply new resolution if it differs from the current one
         if computed_res != self.res:
@@ -532,8 +811,8 @@ class PaintApplication(framework.Framework):
         self.height_view_min = 0.0
         self.height_view_levels = 10
 
-        self.undo_stack = []
-        self.redo_stack = []
+        self.history = history.EditHistory(self.undo_memory_budget, listener=self.journal_patch)
+        self.pending_motion = []
         # Get screen dimensions
         # screen_width = root.winfo_screenwidth()
         # screen_height = root.winfo_screenheight()
@@ -545,18 +824,28 @@ class PaintApplication(framework.Framework):
         
         super().__init__(root)
         self.rescale_grid()
-        self.model = gridmodel.GridModel(nx, ny, self.original_res, self.surface_config)
+        self.model = self.create_model(nx, ny)
         self.create_gui()  # backend is created inside create_gui
         self.backend.draw_grid(self.nx, self.ny, self.res,)
         self.bind_mouse()
         self.bind_shortcuts()
+        self.start_autosave()
         
     # ------------------ Initialize Grid ------------------    
 
+    def create_model(self, nx, ny):
+        """New GridModel; very large domains use tiled, disk-backed layers."""
+        return gridmodel.GridModel(
+            nx, ny, self.original_res, self.surface_config,
+            tiled=nx * ny > self.tiled_model_min_cells,
+        )
+
     def draw_grid(self, nx, ny, res):
         """Reset the data model and redraw the full canvas grid."""
-        self.model = gridmodel.GridModel(nx, ny, self.original_res, self.surface_config)
+        self.model = self.create_model(nx, ny)
         self.backend.model = self.model
+        self.history.clear()
+        self.ensure_backend()
         self.backend.clear()
         self.backend.draw_grid(nx, ny, res)
         self.backend.set_grid_lines_visible(self.show_grid_lines)
@@ -573,14 +862,10 @@ class PaintApplication(framework.Framework):
         self.show_selected_tool_icon_in_top_bar(str(self.tool_bar_functions[0]))
         self.create_tool_bar()
         self.create_tool_bar_buttons()
-        self.backend = tkbackend.TkCanvasBackend(
-            self.root, self.model, self.nx, self.ny, self.res
-        )
-        self.backend.set_view_mode(self.active_view)
-        self.backend.set_height_view_config(self.height_view_min, self.original_res, self.height_view_levels)
-        self.backend.set_grid_lines_visible(self.show_grid_lines)
+        self.create_backend()
         self.create_current_coordinate_label()
         self.create_meter_coordinate_label()
+        self.create_status_label()
         self.create_height_legend_widgets()
         self.create_menu()
         self.create_brush_size_slider()
@@ -588,6 +873,28 @@ class PaintApplication(framework.Framework):
         self.update_height_legend_visibility()
         
         
+    def get_backend_class(self):
+        """Use per-cell rectangles for small grids and a single image for large ones."""
+        if self.nx * self.ny > self.image_backend_min_cells:
+            return tkimagebackend.TkImageBackend
+        return tkbackend.TkCanvasBackend
+
+    def create_backend(self):
+        """Create the render backend suited to the current grid size."""
+        backend_class = self.get_backend_class()
+        self.backend = backend_class(self.root, self.model, self.nx, self.ny, self.res)
+        self.backend.set_view_mode(self.active_view)
+        self.backend.set_height_view_config(self.height_view_min, self.original_res, self.height_view_levels)
+        self.backend.set_grid_lines_visible(self.show_grid_lines)
+
+    def ensure_backend(self):
+        """Swap the render backend if the grid size now calls for the other one."""
+        if type(self.backend) is self.get_backend_class():
+            return
+        self.backend.canvas_frame.destroy()
+        self.create_backend()
+        self.bind_mouse()
+
     def create_brush_size_slider(self):
         """Create a slider to adjust the brush size."""
         self.brush_size_slider = tk.Scale(self.tool_bar, from_=1, to=10,
@@ -719,6 +1026,10 @@ class PaintApplication(framework.Framework):
         coordinate_string = "nx:{0}\nny:{1}".format(x_coordinate, y_coordinate)
         self.current_coordinate_label.config(text=coordinate_string)
         
+    def create_status_label(self):
+        self.status_label = tk.Label(self.tool_bar, text='', justify="left")
+        self.status_label.grid(row=21, column=1, columnspan=2, pady=5, padx=1, sticky='w')
+
     def create_meter_coordinate_label(self):
         # Create a second label for meter coordinates and position it below the grid coordinate label
         self.meter_coordinate_label = tk.Label(self.tool_bar, text='x:0\ny:0')
@@ -753,13 +1064,22 @@ class PaintApplication(framework.Framework):
         self.save_state()
         self.start_x = self.end_x = self.canvas.canvasx(event.x)
         self.start_y = self.end_y = self.canvas.canvasy(event.y)
+        if self.bucket_fill_armed:
+            self.fill_region(*self.get_pixel_position())
+            return
+        self.last_cell = self.get_pixel_position()
         self.execute_selected_method()
 
 
 
     def on_mouse_button_released(self, event):
+        self.finish_motion()
         self.end_x = self.canvas.canvasx(event.x)
         self.end_y = self.canvas.canvasy(event.y)
+        self.end_state()
+        if self.bucket_fill_armed:
+            self.bucket_fill_armed = False
+            self.canvas.config(cursor="")
 
     def on_mouse_unpressed_motion(self, event):
         self.show_current_coordinates(event)
@@ -771,11 +1091,12 @@ class PaintApplication(framework.Framework):
     def create_menu(self):
         self.menubar = tk.Menu(self.root)
         menu_definitions = (
-            'File - New Project//self.new_project, Save to NetCDF//self.save_netcdf, Save NetCDF as ...//self.save_as_netcdf, sep,'+
+            'File - New Project//self.new_project, Open Project ...//self.open_project, Save Project as ...//self.save_project, sep,'+
+            'Save to NetCDF//self.save_netcdf, Save NetCDF as ...//self.save_as_netcdf, sep,'+
             'Load from NetCDF//self.load_project_netcdf, sep, Exit//self.root.quit',
             'View- Landcover View//self.set_landcover_view, Heightmap View//self.set_heightmap_view, Soil View//self.set_soil_view, sep, Zoom in/Ctrl+ Up Arrow/self.canvas_zoom_in,Zoom Out/Ctrl+Down Arrow/self.canvas_zoom_out, Toggle Gridlines/Ctrl+G/self.toggle_gridlines',
             'Edit - Undo/Ctrl + z/self.undo, Redo/Ctrl + y/self.redo, Bucket Fill//self.bucket_fill',
-            'Extras - Generate Report//self.generate_report, Change Origin//self.change_origin',
+            'Extras - Generate Report//self.generate_report, Change Origin//self.change_origin, Resample Grid ...//self.resample_grid',
         )
         self.build_menu(menu_definitions)
 
@@ -806,7 +1127,7 @@ class PaintApplication(framework.Framework):
         self.root.bind("<Control-g>", self.toggle_gridlines)
 
     def toggle_gridlines(self, event=None):
-        """Toggle visibility of white pixel outlines on the canvas."""
+        """Toggle the grid line overlay on the canvas."""
         self.show_grid_lines = not self.show_grid_lines
         self.backend.set_grid_lines_visible(self.show_grid_lines)
         
@@ -1243,8 +1564,28 @@ class PaintApplication(framework.Framework):
         
     def generate_report(self):
         """Trigger the analysis report."""
-        report.generate_report(self.root, self.model.to_legacy_dict(), self.nx, self.ny, self.original_res, self.origin)
+        report.generate_report(self.root, self.model, self.origin)
         
+    def resample_grid(self):
+        """Regrid the model to a new grid width (e.g. coarsen a driver for test runs)."""
+        if self.refuse_while_loading("Resample Grid"):
+            return
+        new_res = tk.simpledialog.askfloat(
+            "Resample Grid", "New grid width (m):",
+            initialvalue=self.original_res, minvalue=0.01, parent=self.root,
+        )
+        if not new_res or new_res == self.original_res:
+            return
+        try:
+            model = self.model.resample(new_res)
+        except ValueError as e:
+            tk.messagebox.showerror("Resample Grid", str(e))
+            return
+        self.set_model(model, self.origin)
+        self.backend.set_height_view_config(self.height_view_min, self.original_res, self.height_view_levels)
+        self.backend.update_grid(self.nx, self.ny, self.res)
+        print(f"Resampled grid to {self.nx} x {self.ny} cells of {self.original_res} m")
+
     def change_origin(self):
         """Change the origin of the grid with a simple input form (prefilled with current values)."""
         dialog = tk.Toplevel(self.root)
@@ -1302,4 +1643,5 @@ if __name__ == '__main__':
     root.deiconify()
     root.title("PALMPaint")
     app = PaintApplication(root, nx, ny, res)
-    root.mainloop()
\ No newline at end of file
+    root.mainloop()
+    app.stop_autosave()
\ No newline at end of file